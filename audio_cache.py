@@ -0,0 +1,198 @@
+"""
+Local disk read-through cache for chapter audio
+Chapters streamed from R2 are kept on the web node in a size-bounded LRU
+directory so repeated plays and seeks are served from local disk.
+The directory itself is the index (mtime = last use), so every gunicorn
+worker on the node shares one cache.
+"""
+import os
+import re
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from werkzeug.wsgi import wrap_file
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 256 * 1024
+MISSING_TTL = 60  # Don't retry warming a chapter that doesn't exist (yet) for a minute
+
+class AudioCache:
+    """Size-bounded LRU cache of chapter MP3s on local disk"""
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or os.environ.get(
+            'AUDIO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'audiobook-cache')
+        )
+        self.max_bytes = max_bytes or int(os.environ.get('AUDIO_CACHE_MAX_MB', 1024)) * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._filling = set()
+        self._missing = {}  # r2_key -> retry_after
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'fills': 0,
+            'fill_errors': 0,
+            'evictions': 0,
+            'bytes_served': 0
+        }
+
+    def path_for(self, r2_key: str) -> str:
+        """Local file that caches an R2 object"""
+        digest = hashlib.sha1(r2_key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.mp3")
+
+    def get(self, r2_key: str):
+        """Return the cached file path (marking it recently used), or None on a miss"""
+        path = self.path_for(r2_key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+        return path
+
+    def record_served(self, nbytes: int):
+        with self._lock:
+            self.stats['bytes_served'] += nbytes
+
+    def fill(self, r2, bucket_name: str, r2_key: str):
+        """Download an object into the cache; returns its path, or None if it does not exist"""
+        path = self.path_for(r2_key)
+        if os.path.exists(path):
+            return path
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                r2.download_fileobj(bucket_name, r2_key, tmp_file)
+            os.replace(tmp_path, path)  # Atomic: readers never see a partial file
+        except ClientError as e:
+            os.unlink(tmp_path)
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                with self._lock:
+                    self._missing[r2_key] = time.time() + MISSING_TTL
+            else:
+                logger.warning(f"Audio cache fill failed for {r2_key}: {e}")
+                with self._lock:
+                    self.stats['fill_errors'] += 1
+            return None
+        except Exception as e:
+            os.unlink(tmp_path)
+            logger.warning(f"Audio cache fill failed for {r2_key}: {e}")
+            with self._lock:
+                self.stats['fill_errors'] += 1
+            return None
+
+        with self._lock:
+            self.stats['fills'] += 1
+        self._evict()
+        return path
+
+    def warm(self, r2, bucket_name: str, *r2_keys):
+        """Fill the cache with the given objects on a background thread"""
+        now = time.time()
+        with self._lock:
+            self._missing = {key: retry_after for key, retry_after in self._missing.items() if retry_after > now}
+            keys = [
+                key for key in r2_keys
+                if key not in self._filling and key not in self._missing and not os.path.exists(self.path_for(key))
+            ]
+            self._filling.update(keys)
+        if not keys:
+            return
+
+        def run():
+            for key in keys:
+                try:
+                    self.fill(r2, bucket_name, key)
+                finally:
+                    with self._lock:
+                        self._filling.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _evict(self):
+        """Delete least recently used files until the cache fits its budget"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.mp3'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)  # Open readers keep their file handle
+                total -= size
+                with self._lock:
+                    self.stats['evictions'] += 1
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> dict:
+        """Hit-rate and size metrics for this process"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        stats['size_bytes'] = sum(
+            entry.stat().st_size for entry in os.scandir(self.cache_dir) if entry.name.endswith('.mp3')
+        )
+        return stats
+
+def next_chapter_key(r2_key: str):
+    """R2 key of the chapter after this one, or None if the key is not a chapter"""
+    match = re.match(r'^(.*/chapter_)(\d+)\.mp3$', r2_key)
+    if not match:
+        return None
+    return f"{match.group(1)}{int(match.group(2)) + 1}.mp3"
+
+def file_body(environ: dict, file_obj, length: int):
+    """
+    Response body for `length` bytes from the current position of an open file
+
+    Under gunicorn the WSGI file wrapper is used, which sends exactly
+    Content-Length bytes from the current offset with sendfile() (zero-copy).
+    Other servers read the file wrapper to EOF, so they get a bounded reader.
+    """
+    if 'gunicorn' in environ.get('SERVER_SOFTWARE', '') and 'wsgi.file_wrapper' in environ:
+        return wrap_file(environ, file_obj, READ_BLOCK_SIZE)
+    return _read_range(file_obj, length)
+
+def read_file_range(path: str, start: int, end: int):
+    """Bounded reader for bytes start..end (inclusive) of a file"""
+    file_obj = open(path, 'rb')
+    file_obj.seek(start)
+    return _read_range(file_obj, end - start + 1)
+
+def _read_range(file_obj, length: int):
+    try:
+        remaining = length
+        while remaining > 0:
+            chunk = file_obj.read(min(READ_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file_obj.close()
@@ -1,6 +1,8 @@
 import asyncio
+import json
 import logging
 import os
+import secrets
 import tempfile
 from pathlib import Path
 from typing import Optional
@@ -13,6 +15,7 @@ from ebooklib import epub
 import aiofiles
 
 from podcast import PodcastGenerator
+from webhooks import verify_signature, EVENT_HEADER, TIMESTAMP_HEADER, SIGNATURE_HEADER
 
 # Configure logging
 logging.basicConfig(
@@ -24,7 +27,17 @@ logger = logging.getLogger(__name__)
 class EpubAudiobookBot:
     def __init__(self, token: str):
         self.token = token
-        self.app = Application.builder().token(token).build()
+        
+        # With a public callback URL the service reports job progress to us instead of being polled
+        self.callback_base_url = os.getenv('BOT_CALLBACK_URL', '').rstrip('/')
+        self.callback_secret = os.getenv('BOT_CALLBACK_SECRET') or secrets.token_hex(32)
+        self.pending_jobs = {}  # callback token -> the upload's chat message and book
+        self.last_jobs = {}  # user id -> job id of their latest upload, for /cancel
+        
+        builder = Application.builder().token(token)
+        if self.callback_base_url:
+            builder = builder.post_init(self.start_callback_server)
+        self.app = builder.build()
         self.temp_dir = Path(tempfile.mkdtemp())
         self.podcast_gen = PodcastGenerator()
         self.setup_handlers()
@@ -36,6 +49,7 @@ class EpubAudiobookBot:
         self.app.add_handler(CommandHandler("podcast", self.podcast_command))
         self.app.add_handler(CommandHandler("stats", self.stats_command))
         self.app.add_handler(CommandHandler("linkcar", self.link_car_command))
+        self.app.add_handler(CommandHandler("cancel", self.cancel_command))
         self.app.add_handler(MessageHandler(filters.Document.FileExtension("epub"), self.handle_epub))
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -55,6 +69,7 @@ class EpubAudiobookBot:
             "/podcast - Get your personal podcast feed URL\n"
             "/linkcar - Link your Android Auto car app\n"
             "/stats - View your audiobook statistics\n"
+            "/cancel - Stop converting your latest EPUB\n"
             "/start - Start the bot"
         )
         await update.message.reply_text(welcome_message)
@@ -105,6 +120,38 @@ class EpubAudiobookBot:
         )
         await update.message.reply_text(help_message)
     
+    async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /cancel [job_id] - stop a conversion (your latest one by default)"""
+        user_id = str(update.effective_user.id)
+        job_id = context.args[0] if context.args else self.last_jobs.get(user_id)
+        if not job_id:
+            await update.message.reply_text("There is no conversion to cancel. Usage: /cancel [job_id]")
+            return
+        
+        try:
+            import aiohttp
+            async with aiohttp.ClientSession() as session:
+                async with session.delete(
+                    f'https://epub-audiobook-service-ab00bb696e09.herokuapp.com/api/jobs/{job_id}',
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    result = await response.json()
+            
+            if response.status == 202:
+                self.last_jobs.pop(user_id, None)
+                await update.message.reply_text(
+                    f"🛑 Cancelling {result.get('book_title') or 'your conversion'}...\n"
+                    f"🆔 Job ID: {job_id}"
+                )
+            elif response.status == 409:
+                await update.message.reply_text(f"ℹ️ That conversion is already {result.get('status', 'finished')}.")
+            else:
+                await update.message.reply_text(f"⚠️ Job {job_id} was not found.")
+                
+        except Exception as e:
+            logger.error(f"Error cancelling job {job_id}: {e}")
+            await update.message.reply_text(f"❌ Could not cancel the conversion: {e}")
+    
     async def podcast_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /podcast command - return user's podcast feed URL"""
         user_id = update.effective_user.id
@@ -200,6 +247,7 @@ class EpubAudiobookBot:
         processing_msg = await update.message.reply_text(
             "📖 Processing your EPUB file...\n⏳ Sending to cloud service for processing..."
         )
+        callback_token = None
         
         try:
             # Download EPUB file and convert to base64
@@ -221,6 +269,15 @@ class EpubAudiobookBot:
                     'book_title': book_title,
                     'epub_data': epub_data
                 }
+                if self.callback_base_url:
+                    callback_token = secrets.token_urlsafe(16)
+                    self.pending_jobs[callback_token] = {
+                        'processing_msg': processing_msg,
+                        'update': update,
+                        'book_title': book_title
+                    }
+                    payload['callback_url'] = f'{self.callback_base_url}/callbacks/{callback_token}'
+                    payload['callback_secret'] = self.callback_secret
                 
                 async with session.post(
                     'https://epub-audiobook-service-ab00bb696e09.herokuapp.com/api/process-epub',
@@ -228,9 +285,17 @@ class EpubAudiobookBot:
                     timeout=aiohttp.ClientTimeout(total=30)
                 ) as response:
                     
+                    if response.status != 200:
+                        self.pending_jobs.pop(callback_token, None)
+                    
                     if response.status == 200:
                         result = await response.json()
                         job_id = result.get('job_id')
+                        self.last_jobs[user_id] = job_id
+                        
+                        pending = self.pending_jobs.get(callback_token) if callback_token else None
+                        if callback_token and result.get('callback_registered') and pending is None:
+                            return  # The service already called back with the outcome (e.g. a converted duplicate)
                         
                         await processing_msg.edit_text(
                             f"✅ EPUB sent to cloud service!\n\n"
@@ -240,9 +305,26 @@ class EpubAudiobookBot:
                             f"🎧 Waiting for audiobook processing to complete..."
                         )
                         
-                        # Poll job status until completion
-                        await self.wait_for_job_completion(session, job_id, processing_msg, update, book_title)
+                        if pending is not None and result.get('callback_registered'):
+                            # The service will call back; nothing to hold open meanwhile
+                            pending['job_id'] = job_id
+                            pending['last_callback_at'] = asyncio.get_running_loop().time()
+                            asyncio.create_task(self.callback_watchdog(callback_token))
+                            return
+                        self.pending_jobs.pop(callback_token, None)
                         
+                        # Follow job status until completion
+                        await self.wait_for_job_completion(session, job_id, processing_msg, update, book_title)
+
+                    elif response.status == 429:
+                        result = await response.json()
+                        await processing_msg.edit_text(
+                            f"⏳ The conversion service is busy\n\n"
+                            f"📚 Book: {book_title}\n"
+                            f"💬 {result.get('message', 'The conversion queue is full')}\n\n"
+                            f"Please send the EPUB again in about {result.get('retry_after', 60)} seconds."
+                        )
+
                     else:
                         error_text = await response.text()
                         await processing_msg.edit_text(
@@ -253,6 +335,7 @@ class EpubAudiobookBot:
             
         except Exception as e:
             logger.error(f"Error processing EPUB: {e}")
+            self.pending_jobs.pop(callback_token, None)
             await processing_msg.edit_text(
                 f"❌ Error processing file: {str(e)}\n\n"
                 f"Please try again later or contact support."
@@ -269,72 +352,84 @@ class EpubAudiobookBot:
         return epub_path
     
     async def wait_for_job_completion(self, session, job_id: str, processing_msg, update: Update, book_title: str):
-        """Poll job status until completion and send files to user"""
-        import asyncio
+        """Follow job progress with long-polls until completion and send files to user"""
+        import aiohttp
         
-        max_polls = 180  # Max 30 minutes (180 polls * 10 seconds)
-        poll_count = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 30 * 60  # Max 30 minutes
+        version = -1
         
-        while poll_count < max_polls:
+        while loop.time() < deadline:
             try:
-                # Check job status
+                # The server holds the request until the job changes past our version (up to 25 s)
                 async with session.get(
-                    f'https://epub-audiobook-service-ab00bb696e09.herokuapp.com/api/job-status/{job_id}',
-                    timeout=aiohttp.ClientTimeout(total=10)
+                    f'https://epub-audiobook-service-ab00bb696e09.herokuapp.com/api/jobs/{job_id}',
+                    params={'since': version, 'timeout': 25},
+                    timeout=aiohttp.ClientTimeout(total=40)
                 ) as status_response:
                     
-                    if status_response.status == 200:
-                        job_status = await status_response.json()
-                        status = job_status.get('status', 'unknown')
-                        progress = job_status.get('progress', 0)
-                        message = job_status.get('message', 'Processing...')
+                    if status_response.status == 404:
+                        await processing_msg.edit_text(
+                            f"⚠️ Job not found\n\n"
+                            f"📚 Book: {book_title}\n"
+                            f"🆔 Job ID: {job_id}\n\n"
+                            f"The processing job may have expired. Please try uploading the EPUB again."
+                        )
+                        return
+                    
+                    if status_response.status != 200:
+                        await asyncio.sleep(10)
+                        continue
+                    
+                    job_status = await status_response.json()
+                    if job_status.get('version', version) <= version:
+                        continue  # Nothing changed, ask again
+                    version = job_status.get('version', version)
+                    
+                    status = job_status.get('status', 'unknown')
+                    progress = job_status.get('progress', 0)
+                    message = job_status.get('message', 'Processing...')
+                    
+                    if status == 'completed':
+                        # Job is done, get the audiobook files
+                        await processing_msg.edit_text(
+                            f"✅ Processing complete!\n\n"
+                            f"📚 Book: {book_title}\n"
+                            f"🎧 Retrieving audiobook files..."
+                        )
+                        
+                        # Get audiobook download info
+                        await self.retrieve_and_send_audiobook(session, job_id, processing_msg, update, book_title)
+                        return
                         
-                        # Update progress message
+                    elif status == 'failed':
                         await processing_msg.edit_text(
-                            f"🔄 Processing: {book_title}\n\n"
-                            f"📊 Progress: {progress}%\n"
-                            f"💬 Status: {message}\n\n"
-                            f"⏳ Please wait, this may take several minutes..."
+                            f"❌ Processing failed\n\n"
+                            f"📚 Book: {book_title}\n"
+                            f"💬 Error: {message}\n\n"
+                            f"Please try again later."
                         )
+                        return
                         
-                        if status == 'completed':
-                            # Job is done, get the audiobook files
-                            await processing_msg.edit_text(
-                                f"✅ Processing complete!\n\n"
-                                f"📚 Book: {book_title}\n"
-                                f"🎧 Retrieving audiobook files..."
-                            )
-                            
-                            # Get audiobook download info
-                            await self.retrieve_and_send_audiobook(session, job_id, processing_msg, update, book_title)
-                            return
-                            
-                        elif status == 'failed':
-                            await processing_msg.edit_text(
-                                f"❌ Processing failed\n\n"
-                                f"📚 Book: {book_title}\n"
-                                f"💬 Error: {message}\n\n"
-                                f"Please try again later."
-                            )
-                            return
-                            
-                        elif status == 'not_found':
-                            await processing_msg.edit_text(
-                                f"⚠️ Job not found\n\n"
-                                f"📚 Book: {book_title}\n"
-                                f"🆔 Job ID: {job_id}\n\n"
-                                f"The processing job may have expired. Please try uploading the EPUB again."
-                            )
-                            return
-                
-                # Wait before next poll
-                await asyncio.sleep(10)
-                poll_count += 1
+                    elif status == 'cancelled':
+                        await processing_msg.edit_text(
+                            f"🛑 Conversion cancelled\n\n"
+                            f"📚 Book: {book_title}\n"
+                            f"💬 {message}"
+                        )
+                        return
+                    
+                    # Update progress message
+                    await processing_msg.edit_text(
+                        f"🔄 Processing: {book_title}\n\n"
+                        f"📊 Progress: {progress}%\n"
+                        f"💬 Status: {message}\n\n"
+                        f"⏳ Please wait, this may take several minutes..."
+                    )
                 
             except Exception as e:
                 logger.error(f"Error polling job status: {e}")
                 await asyncio.sleep(10)
-                poll_count += 1
         
         # Timeout reached
         await processing_msg.edit_text(
@@ -345,6 +440,103 @@ class EpubAudiobookBot:
             f"Please check your Android Auto app later or try again."
         )
     
+    async def start_callback_server(self, application: Application):
+        """Serve the webhook endpoint the conversion service reports jobs to (runs inside the bot's loop)"""
+        from aiohttp import web
+        
+        web_app = web.Application()
+        web_app.router.add_post('/callbacks/{token}', self.handle_job_callback)
+        runner = web.AppRunner(web_app)
+        await runner.setup()
+        port = int(os.getenv('BOT_CALLBACK_PORT', os.getenv('PORT', 8080)))
+        await web.TCPSite(runner, '0.0.0.0', port).start()
+        logger.info(f"Listening for job callbacks on port {port}")
+    
+    async def handle_job_callback(self, request):
+        """Progress, completion and failure webhooks for jobs this bot submitted"""
+        from aiohttp import web
+        
+        body = await request.read()
+        if not verify_signature(self.callback_secret, request.headers.get(TIMESTAMP_HEADER), body,
+                                request.headers.get(SIGNATURE_HEADER)):
+            return web.Response(status=401)
+        
+        pending = self.pending_jobs.get(request.match_info['token'])
+        if not pending:
+            return web.Response(status=410)  # Already finished (or from before a restart): stop retrying
+        
+        event = request.headers.get(EVENT_HEADER)
+        job_status = json.loads(body)
+        if job_status.get('version', 0) < pending.get('version', 0):
+            return web.Response()  # A newer update already arrived
+        pending['version'] = job_status.get('version', 0)
+        pending['last_callback_at'] = asyncio.get_running_loop().time()
+        
+        processing_msg, book_title = pending['processing_msg'], pending['book_title']
+        if event == 'job.completed':
+            self.pending_jobs.pop(request.match_info['token'], None)
+            asyncio.create_task(self.send_completed_audiobook(job_status['job_id'], pending))
+        elif event == 'job.failed':
+            self.pending_jobs.pop(request.match_info['token'], None)
+            await processing_msg.edit_text(
+                f"❌ Processing failed\n\n"
+                f"📚 Book: {book_title}\n"
+                f"💬 Error: {job_status.get('message') or job_status.get('error', 'Unknown error')}\n\n"
+                f"Please try again later."
+            )
+        elif event == 'job.cancelled':
+            self.pending_jobs.pop(request.match_info['token'], None)
+            await processing_msg.edit_text(
+                f"🛑 Conversion cancelled\n\n"
+                f"📚 Book: {book_title}\n"
+                f"💬 {job_status.get('message', 'Cancelled')}"
+            )
+        else:
+            try:
+                await processing_msg.edit_text(
+                    f"🔄 Processing: {book_title}\n\n"
+                    f"📊 Progress: {job_status.get('progress', 0)}%\n"
+                    f"💬 Status: {job_status.get('message', 'Processing...')}\n\n"
+                    f"⏳ Please wait, this may take several minutes..."
+                )
+            except Exception as e:
+                logger.warning(f"Could not update progress message: {e}")
+        return web.Response()
+    
+    async def send_completed_audiobook(self, job_id: str, pending: dict):
+        """Deliver a finished audiobook reported by webhook"""
+        import aiohttp
+        
+        processing_msg, book_title = pending['processing_msg'], pending['book_title']
+        await processing_msg.edit_text(
+            f"✅ Processing complete!\n\n"
+            f"📚 Book: {book_title}\n"
+            f"🎧 Retrieving audiobook files..."
+        )
+        async with aiohttp.ClientSession() as session:
+            await self.retrieve_and_send_audiobook(session, job_id, processing_msg, pending['update'], book_title)
+    
+    async def callback_watchdog(self, callback_token: str):
+        """Fall back to long-polling a job whose callbacks stop arriving (e.g. the service restarted)"""
+        import aiohttp
+        
+        timeout = int(os.getenv('BOT_CALLBACK_TIMEOUT', 30 * 60))
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = self.pending_jobs.get(callback_token)
+            if not pending:
+                return
+            # Measured from the latest callback, so long conversions that keep reporting aren't dropped
+            silent_for = loop.time() - pending.get('last_callback_at', loop.time())
+            if silent_for >= timeout:
+                break
+            await asyncio.sleep(timeout - silent_for)
+        self.pending_jobs.pop(callback_token, None)
+        async with aiohttp.ClientSession() as session:
+            await self.wait_for_job_completion(
+                session, pending['job_id'], pending['processing_msg'], pending['update'], pending['book_title']
+            )
+    
     async def retrieve_and_send_audiobook(self, session, job_id: str, processing_msg, update: Update, book_title: str):
         """Retrieve processed audiobook from backend and send files to user"""
         try:
@@ -2,29 +2,18 @@
 """
 Check R2 buckets and create the required bucket if needed
 """
-import boto3
 from dotenv import load_dotenv
 import os
 
+from r2_client import get_r2_client as get_shared_r2_client
+
 # Load environment variables
 load_dotenv()
 
 def get_r2_client():
     """Get Cloudflare R2 client"""
-    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
-    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
-    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
-    
-    if r2_endpoint and r2_access_key and r2_secret_key:
-        r2 = boto3.client(
-            's3',
-            endpoint_url=r2_endpoint,
-            aws_access_key_id=r2_access_key,
-            aws_secret_access_key=r2_secret_key,
-            region_name='auto'  # Cloudflare R2 uses 'auto'
-        )
-        return r2
-    return None
+    r2, _ = get_shared_r2_client()
+    return r2
 
 def main():
     r2 = get_r2_client()
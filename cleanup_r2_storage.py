@@ -4,37 +4,29 @@ Cloudflare R2 Storage Cleanup Script
 Analyzes and cleans up duplicate audiobooks in R2 storage
 """
 
-import os
 import json
-import boto3
 from collections import defaultdict
 from datetime import datetime
 import hashlib
 
+from r2_client import get_r2_client as get_shared_r2_client
+from storage_ops import iter_objects, delete_keys
+import library_manifest
+import job_index
+
 # Don't load .env files as they contain template values
 
 def get_r2_client():
     """Initialize R2 client"""
     # Get R2 credentials from environment variables
-    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
-    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
-    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
-    r2_bucket = os.environ.get('R2_BUCKET_NAME', 'ebuppool')
+    r2, r2_bucket = get_shared_r2_client()
     
-    if not all([r2_endpoint, r2_access_key, r2_secret_key]):
+    if not r2:
         print("❌ R2 credentials not found in environment variables")
         print("Please set: R2_ENDPOINT_URL, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY")
         return None, None
     
-    r2 = boto3.client(
-        's3',
-        endpoint_url=r2_endpoint,
-        aws_access_key_id=r2_access_key,
-        aws_secret_access_key=r2_secret_key,
-        region_name='auto'
-    )
-    
-    return r2, r2_bucket
+    return r2, r2_bucket or 'ebuppool'
 
 def analyze_storage_structure(r2, bucket_name):
     """Analyze the current storage structure"""
@@ -66,6 +58,10 @@ def analyze_storage_structure(r2, bucket_name):
             
             parts = key.split('/')
             
+            if parts[0].startswith('_'):
+                # Service data (_system/ manifests, indexes, tombstones)
+                continue
+            
             if len(parts) >= 2:
                 user_id = parts[0]
                 
@@ -228,24 +224,22 @@ def execute_cleanup(r2, bucket_name, cleanup_plan, dry_run=True):
             prefix = f"{user_id}/{job_id}/"
             
             try:
-                # List all objects with this prefix
-                response = r2.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-                objects_to_delete = response.get('Contents', [])
+                # List all objects with this prefix (every page)
+                objects_to_delete = list(iter_objects(r2, bucket_name, prefix))
                 
                 if objects_to_delete:
                     print(f"📖 {book['title']} (Job: {job_id})")
                     print(f"   📁 Deleting {len(objects_to_delete)} files from {prefix}")
                     
                     if not dry_run:
-                        # Delete objects in batches
-                        for i in range(0, len(objects_to_delete), 1000):
-                            batch = objects_to_delete[i:i+1000]
-                            delete_objects = [{'Key': obj['Key']} for obj in batch]
-                            
-                            r2.delete_objects(
-                                Bucket=bucket_name,
-                                Delete={'Objects': delete_objects}
-                            )
+                        # Delete objects in batches of 1000
+                        result = delete_keys(r2, bucket_name, [obj['Key'] for obj in objects_to_delete])
+                        if result['errors']:
+                            print(f"   ⚠️  {len(result['errors'])} files could not be deleted")
+                        
+                        # Keep the library manifest and job index in step
+                        library_manifest.remove_audiobook(r2, bucket_name, user_id, job_id)
+                        job_index.forget_job(r2, bucket_name, job_id)
                     
                     batch_size = sum(obj['Size'] for obj in objects_to_delete)
                     deleted_count += len(objects_to_delete)
@@ -265,6 +265,26 @@ class AdvancedTTSService:
             logger.error("No TTS service available")
             return False
     
+    async def text_to_speech_bytes(
+        self, 
+        text: str, 
+        voice_name: str = "en-US-AriaNeural",
+        **kwargs
+    ) -> Optional[bytes]:
+        """Convert text to speech and return the MP3 bytes instead of writing a file"""
+        if self.backend == "edge" and self.edge_service:
+            return await self.edge_service.text_to_speech_bytes(text, voice_name)
+        
+        # Coqui only renders to a file path, so go through a short-lived temp file
+        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_file:
+            output_path = tmp_file.name
+        try:
+            if await self.text_to_speech(text, output_path, voice_name, **kwargs):
+                return Path(output_path).read_bytes()
+            return None
+        finally:
+            os.unlink(output_path)
+    
     def get_backend_info(self) -> dict:
         """Get information about active TTS backend"""
         return {
@@ -4,13 +4,14 @@ Simple debug version of the bot to test basic connectivity and R2 upload
 """
 import logging
 import os
-import boto3
 import tempfile
 import base64
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 
+from r2_client import get_r2_client
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -23,24 +24,6 @@ logger = logging.getLogger(__name__)
 
 BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
 
-def get_r2_client():
-    """Get Cloudflare R2 client"""
-    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
-    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
-    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
-    r2_bucket = os.environ.get('R2_BUCKET_NAME')
-    
-    if r2_endpoint and r2_access_key and r2_secret_key:
-        r2 = boto3.client(
-            's3',
-            endpoint_url=r2_endpoint,
-            aws_access_key_id=r2_access_key,
-            aws_secret_access_key=r2_secret_key,
-            region_name='auto'  # Cloudflare R2 uses 'auto'
-        )
-        return r2, r2_bucket
-    return None, None
-
 async def upload_epub_to_r2(file_path: str, user_id: str, file_name: str) -> str:
     """Upload EPUB file to Cloudflare R2"""
     try:
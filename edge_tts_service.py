@@ -22,6 +22,24 @@ class EdgeTTSService:
             logger.error(f"EdgeTTS conversion failed: {e}")
             return False
     
+    async def text_to_speech_bytes(self, text: str, voice_name: str = None) -> bytes:
+        """Convert text to speech in memory using EdgeTTS, returning the MP3 bytes"""
+        try:
+            voice = voice_name or self.detect_language_and_voice(text)
+            communicate = edge_tts.Communicate(text, voice)
+            
+            audio = bytearray()
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    audio.extend(chunk["data"])
+            
+            logger.info(f"EdgeTTS: Successfully synthesized {len(audio)} bytes using voice {voice}")
+            return bytes(audio) if audio else None
+            
+        except Exception as e:
+            logger.error(f"EdgeTTS conversion failed: {e}")
+            return None
+    
     def get_available_voices(self):
         """Get list of available EdgeTTS voices"""
         return [
@@ -0,0 +1,139 @@
+"""
+Durable record of processed EPUBs and scanner leadership
+The ledger lives in R2 so it survives dyno restarts and is shared by every
+gunicorn worker; a lease object makes sure only one scanner runs cluster-wide.
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime
+
+from r2_client import read_json_object, update_json_object
+
+logger = logging.getLogger(__name__)
+
+LEDGER_KEY = "_system/processed_epubs.json"
+LEASE_KEY = "_system/scanner_lease.json"
+
+class ProcessedLedger:
+    """Processed EPUBs keyed by (r2_key, ETag)"""
+
+    def __init__(self, r2, bucket_name: str):
+        self.r2 = r2
+        self.bucket_name = bucket_name
+        self.cache_ttl = float(os.environ.get('LEDGER_CACHE_TTL', 30))
+        self._entries = {}
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self, force: bool = False):
+        with self._lock:
+            if not force and time.time() - self._loaded_at < self.cache_ttl:
+                return
+            ledger, _ = read_json_object(self.r2, self.bucket_name, LEDGER_KEY)
+            self._entries = (ledger or {}).get('entries', {})
+            self._loaded_at = time.time()
+
+    def is_processed(self, r2_key: str, etag: str) -> bool:
+        """True if this exact version of the EPUB has already been converted"""
+        self._refresh()
+        entry = self._entries.get(r2_key)
+        return bool(entry) and entry.get('etag') == etag
+
+    def mark_processed(self, r2_key: str, etag: str, job_id: str = None):
+        """Record an EPUB version as converted (or handed to a conversion job)"""
+        record = {
+            'etag': etag,
+            'job_id': job_id,
+            'processed_at': datetime.now().isoformat()
+        }
+
+        def mutate(ledger):
+            ledger = ledger or {'entries': {}}
+            ledger['entries'][r2_key] = record
+            ledger['updated_at'] = record['processed_at']
+            return ledger
+
+        ledger = update_json_object(self.r2, self.bucket_name, LEDGER_KEY, mutate)
+        with self._lock:
+            self._entries = ledger['entries']
+            self._loaded_at = time.time()
+
+    def forget_prefix(self, prefix: str) -> int:
+        """Drop every EPUB under prefix from the ledger; returns how many were removed"""
+        removed = []
+
+        def mutate(ledger):
+            removed.clear()
+            if not ledger:
+                return None
+            removed.extend(key for key in ledger['entries'] if key.startswith(prefix))
+            if not removed:
+                return None
+            for key in removed:
+                del ledger['entries'][key]
+            ledger['updated_at'] = datetime.now().isoformat()
+            return ledger
+
+        ledger = update_json_object(self.r2, self.bucket_name, LEDGER_KEY, mutate)
+        with self._lock:
+            self._entries = (ledger or {}).get('entries', {})
+            self._loaded_at = time.time()
+        return len(removed)
+
+    def size(self) -> int:
+        """Number of EPUBs in the ledger"""
+        self._refresh()
+        return len(self._entries)
+
+class LeaderLease:
+    """Time-limited, renewable lease held by at most one scanner instance"""
+
+    def __init__(self, r2, bucket_name: str, ttl: float = None):
+        self.r2 = r2
+        self.bucket_name = bucket_name
+        self.ttl = ttl or float(os.environ.get('SCANNER_LEASE_TTL', 90))
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def acquire(self) -> bool:
+        """Take or renew the lease; returns True while this instance is the leader"""
+        now = time.time()
+
+        def mutate(lease):
+            if lease and lease['holder'] != self.holder_id and lease['expires_at'] > now:
+                return None  # Someone else holds a live lease
+            return {
+                'holder': self.holder_id,
+                'expires_at': now + self.ttl,
+                'renewed_at': datetime.now().isoformat()
+            }
+
+        try:
+            lease = update_json_object(self.r2, self.bucket_name, LEASE_KEY, mutate, max_attempts=2)
+            leader = bool(lease) and lease['holder'] == self.holder_id
+        except Exception as e:
+            logger.warning(f"Could not acquire scanner lease: {e}")
+            leader = False
+
+        if leader != self.is_leader:
+            logger.info(f"{'👑 Acquired' if leader else '⏸️ Lost'} scanner leadership ({self.holder_id})")
+        self.is_leader = leader
+        return leader
+
+    def release(self):
+        """Give up the lease so another instance can take over immediately"""
+        def mutate(lease):
+            if not lease or lease['holder'] != self.holder_id:
+                return None
+            lease['expires_at'] = 0
+            return lease
+
+        try:
+            update_json_object(self.r2, self.bucket_name, LEASE_KEY, mutate, max_attempts=2)
+        except Exception as e:
+            logger.warning(f"Could not release scanner lease: {e}")
+        self.is_leader = False
@@ -0,0 +1,138 @@
+"""
+Lazy EPUB chapter reader
+Reads chapters straight from the EPUB's bytes (or a memoryview of them) in
+reading order: only META-INF/container.xml, the package document (OPF) and
+the spine's (X)HTML documents are ever decompressed, one document at a time
+as chapters are consumed. Images, fonts and stylesheets are never touched.
+"""
+import io
+import zlib
+import zipfile
+import logging
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_PATH = 'META-INF/container.xml'
+DOCUMENT_TYPES = ('application/xhtml+xml', 'text/html')
+
+# Manifest properties of items that are navigation or artwork, not part of the book's text
+SKIPPED_PROPERTIES = {'nav', 'cover-image'}
+
+# Documents with less text than this are covers, title pages and separators
+MIN_CHAPTER_CHARS = 100
+
+_TAG = re.compile(r'<[^>]+>')
+
+class EpubError(Exception):
+    """The data is not a readable EPUB"""
+
+class _BufferFile(io.RawIOBase):
+    """Seekable read-only file over a bytes-like object, without copying it"""
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+class EpubReader:
+    """Spine-ordered chapters of an EPUB held in memory"""
+
+    def __init__(self, data):
+        try:
+            self._zip = zipfile.ZipFile(_BufferFile(data))
+            self.opf_path = self._find_package()
+            self.spine = self._read_spine()
+        except (zipfile.BadZipFile, KeyError, ET.ParseError, ValueError) as e:
+            raise EpubError(f"Not a readable EPUB: {e}") from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def _find_package(self) -> str:
+        names = set(self._zip.namelist())
+        if CONTAINER_PATH in names:
+            container = ET.fromstring(self._zip.read(CONTAINER_PATH))
+            for rootfile in container.iter('{*}rootfile'):
+                path = rootfile.get('full-path')
+                if path in names:
+                    return path
+        # Some generators leave out (or botch) the container; the package is still there
+        for name in sorted(names):
+            if name.lower().endswith('.opf'):
+                return name
+        raise EpubError('No package document (.opf) found')
+
+    def _read_spine(self) -> list:
+        """(archive path, manifest href) of the spine's documents, in reading order"""
+        package = ET.fromstring(self._zip.read(self.opf_path))
+        base = posixpath.dirname(self.opf_path)
+        manifest = {}
+        for item in package.iterfind('{*}manifest/{*}item'):
+            href = unquote(item.get('href', '').split('#')[0])
+            # The EPUB 3 table of contents is often in the spine too; it isn't read aloud
+            if SKIPPED_PROPERTIES & set(item.get('properties', '').split()):
+                continue
+            if href:
+                manifest[item.get('id')] = (posixpath.normpath(posixpath.join(base, href)), href,
+                                            item.get('media-type', ''))
+
+        spine = []
+        for itemref in package.iterfind('{*}spine/{*}itemref'):
+            # Non-linear items (footnotes, answer keys) sit outside the reading order
+            if itemref.get('linear', 'yes') == 'no' or itemref.get('idref') not in manifest:
+                continue
+            path, href, media_type = manifest[itemref.get('idref')]
+            if media_type in DOCUMENT_TYPES and (path, href) not in spine:
+                spine.append((path, href))
+        return spine
+
+    def chapters(self):
+        """
+        Yield {'title', 'text'} for each spine document with enough text
+
+        Documents are decompressed one at a time as the caller iterates, so
+        work on the first chapter can start before the rest are read.
+        """
+        for path, href in self.spine:
+            try:
+                content = self._zip.read(path).decode('utf-8', errors='ignore')
+            except KeyError:
+                logger.warning(f"Spine document {path} is missing from the EPUB")
+                continue
+            except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                raise EpubError(f"Corrupt spine document {path}: {e}") from e
+            text = _TAG.sub('', content).strip()
+            if len(text) > MIN_CHAPTER_CHARS:
+                yield {
+                    'title': href,
+                    'text': text  # Full text for production audiobooks
+                }
@@ -0,0 +1,184 @@
+"""
+Incremental R2 EPUB scanner
+Walks only the {user_id}/epubs/ prefixes a bounded number of pages per tick,
+persisting its cursor and the ETag/LastModified of every EPUB it has seen so
+a tick costs the same regardless of bucket size and survives restarts. The
+cursor and the (library-sized) change-detection map are separate objects,
+each written only when it changes.
+"""
+import os
+import json
+import logging
+from datetime import datetime
+
+from r2_client import read_json_object
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "_system/epub_scanner.json"
+SEEN_KEY = "_system/epub_scanner_seen.json"
+
+class EpubScanner:
+    """Paginated, resumable scan of every user's epubs/ folder"""
+
+    def __init__(self, r2, bucket_name: str):
+        self.r2 = r2
+        self.bucket_name = bucket_name
+        self.pages_per_tick = int(os.environ.get('SCAN_PAGES_PER_TICK', 5))
+        self.page_size = int(os.environ.get('SCAN_PAGE_SIZE', 1000))
+        self.min_interval = float(os.environ.get('SCAN_MIN_INTERVAL', 5))
+        self.max_interval = float(os.environ.get('SCAN_MAX_INTERVAL', 60))
+        self.interval = self.min_interval
+
+        self.pending_prefixes = []
+        self.prefix = None
+        self.start_after = None
+        self.seen = {}  # r2_key -> {'etag': ..., 'last_modified': ...}
+        self.passes = 0
+        self._saved_cursor = None
+        self._seen_dirty = False
+        self._loaded = False
+
+    def _load_state(self):
+        try:
+            state, _ = read_json_object(self.r2, self.bucket_name, STATE_KEY)
+            seen, _ = read_json_object(self.r2, self.bucket_name, SEEN_KEY)
+        except Exception as e:
+            logger.warning(f"Could not load scanner state, starting fresh: {e}")
+            state = seen = None
+
+        if state:
+            self.pending_prefixes = state.get('pending_prefixes', [])
+            self.prefix = state.get('prefix')
+            self.start_after = state.get('start_after')
+            self.passes = state.get('passes', 0)
+            self._saved_cursor = self._cursor()
+            if seen:
+                self.seen = seen.get('seen', {})
+            elif 'seen' in state:
+                # Older state kept the map with the cursor; move it to its own object
+                self.seen = state['seen']
+                self._seen_dirty = True
+                self._saved_cursor = None
+            logger.info(f"📍 Resuming EPUB scan at {self.prefix or 'start of pass'} ({len(self.seen)} EPUBs known)")
+
+    def _cursor(self) -> dict:
+        return {
+            'pending_prefixes': list(self.pending_prefixes),
+            'prefix': self.prefix,
+            'start_after': self.start_after,
+            'passes': self.passes
+        }
+
+    def save_state(self):
+        """Persist the cursor and the change-detection map to R2, each only if it changed"""
+        cursor = self._cursor()
+        if cursor != self._saved_cursor:
+            self._put(STATE_KEY, cursor)
+            self._saved_cursor = cursor
+        if self._seen_dirty:
+            self._put(SEEN_KEY, {'seen': self.seen})
+            self._seen_dirty = False
+
+    def _put(self, key: str, state: dict):
+        self.r2.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=json.dumps({**state, 'updated_at': datetime.now().isoformat()}),
+            ContentType='application/json'
+        )
+
+    def list_epub_prefixes(self) -> list:
+        """The epubs/ folder of every user in the bucket"""
+        prefixes = []
+        paginator = self.r2.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Delimiter='/'):
+            for obj in page.get('CommonPrefixes', []):
+                user_folder = obj['Prefix']
+                if not user_folder.startswith('_'):  # _system/ and other service folders
+                    prefixes.append(f"{user_folder}epubs/")
+        return prefixes
+
+    def iter_epubs(self, prefix: str = None):
+        """Every EPUB object under one epubs/ prefix, or under all of them"""
+        prefixes = [prefix] if prefix else self.list_epub_prefixes()
+        paginator = self.r2.get_paginator('list_objects_v2')
+        for epub_prefix in prefixes:
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=epub_prefix):
+                for obj in page.get('Contents', []):
+                    if obj['Key'].endswith('.epub'):
+                        yield obj
+
+    def _is_changed(self, obj: dict) -> bool:
+        signature = {
+            'etag': obj['ETag'],
+            'last_modified': obj['LastModified'].isoformat()
+        }
+        if self.seen.get(obj['Key']) == signature:
+            return False
+        self.seen[obj['Key']] = signature
+        self._seen_dirty = True
+        return True
+
+    def forget(self, r2_key: str):
+        """Drop an EPUB from change detection so the next pass reports it again"""
+        if self.seen.pop(r2_key, None) is not None:
+            self._seen_dirty = True
+            self.save_state()
+
+    def tick(self) -> list:
+        """Scan up to pages_per_tick pages and return EPUB objects that are new or changed"""
+        if not self._loaded:
+            self._load_state()
+            self._loaded = True
+
+        changed = []
+        pass_finished = False
+        continuation_token = None
+
+        for _ in range(self.pages_per_tick):
+            if not self.prefix:
+                if not self.pending_prefixes:
+                    if pass_finished:
+                        break
+                    self.pending_prefixes = self.list_epub_prefixes()
+                    if not self.pending_prefixes:
+                        pass_finished = True
+                        break
+                self.prefix = self.pending_prefixes.pop(0)
+                self.start_after = None
+                continuation_token = None
+
+            params = {'Bucket': self.bucket_name, 'Prefix': self.prefix, 'MaxKeys': self.page_size}
+            if continuation_token:
+                params['ContinuationToken'] = continuation_token
+            elif self.start_after:
+                params['StartAfter'] = self.start_after
+            response = self.r2.list_objects_v2(**params)
+
+            contents = response.get('Contents', [])
+            for obj in contents:
+                if obj['Key'].endswith('.epub') and self._is_changed(obj):
+                    changed.append(obj)
+
+            if response.get('IsTruncated'):
+                continuation_token = response['NextContinuationToken']
+                self.start_after = contents[-1]['Key'] if contents else self.start_after
+            else:
+                self.prefix = None
+                self.start_after = None
+                continuation_token = None
+                if not self.pending_prefixes:
+                    self.passes += 1
+                    pass_finished = True
+
+        self.save_state()
+        self._adapt_interval(changed, pass_finished)
+        return changed
+
+    def _adapt_interval(self, changed: list, pass_finished: bool):
+        """Scan fast while things change, back off while the bucket is idle"""
+        if changed:
+            self.interval = self.min_interval
+        elif pass_finished:
+            self.interval = min(self.interval * 2, self.max_interval)
@@ -0,0 +1,112 @@
+"""
+HTTP byte ranges (RFC 7233)
+Parses Range headers against a known object size, including suffix
+(bytes=-N), open-ended (bytes=N-) and multi-range requests, and frames
+multipart/byteranges bodies so every request is answered with exactly the
+bytes it asked for.
+"""
+import re
+import uuid
+
+MAX_RANGES = 16  # More parts than this is a scan, not a player seeking
+
+_RANGE_SPEC = re.compile(r'^(\d*)-(\d*)$')
+
+class RangeNotSatisfiable(Exception):
+    """No requested range overlaps the object; answer 416 with Content-Range: bytes */size"""
+
+    def __init__(self, size: int):
+        super().__init__(f"Range not satisfiable for {size} bytes")
+        self.size = size
+
+def parse_range_header(header: str, size: int):
+    """
+    Resolve a Range header to a list of inclusive (start, end) offsets
+
+    Returns None if the header does not use the bytes unit (RFC 7233 says to
+    ignore it and send the full representation). Overlapping and adjacent
+    ranges are coalesced. Raises RangeNotSatisfiable for malformed byte
+    ranges, ranges that all lie beyond the end of the object and requests for
+    more than MAX_RANGES parts.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        match = _RANGE_SPEC.match(part.strip())
+        if not match or match.groups() == ('', ''):
+            raise RangeNotSatisfiable(size)
+        first, last = match.groups()
+
+        if not first:
+            # Suffix range: the final N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size - 1))
+            continue
+
+        start = int(first)
+        end = int(last) if last else size - 1
+        if end < start:
+            raise RangeNotSatisfiable(size)
+        if start >= size:
+            continue  # Unsatisfiable on its own, but others may still be served
+        ranges.append((start, min(end, size - 1)))
+
+    ranges = coalesce_ranges(ranges)
+    if not ranges or len(ranges) > MAX_RANGES:
+        raise RangeNotSatisfiable(size)
+    return ranges
+
+def coalesce_ranges(ranges: list) -> list:
+    """Merge overlapping and adjacent ranges, in ascending order"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def content_range(start: int, end: int, size: int) -> str:
+    return f'bytes {start}-{end}/{size}'
+
+def unsatisfiable_content_range(size: int) -> str:
+    return f'bytes */{size}'
+
+class MultipartByteranges:
+    """
+    multipart/byteranges framing for a set of ranges
+
+    The part headers are known up front, so the exact Content-Length is
+    available before any body bytes are read.
+    """
+
+    def __init__(self, ranges: list, size: int, content_type: str):
+        self.ranges = ranges
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/byteranges; boundary={self.boundary}'
+        self._part_headers = [
+            (
+                f'\r\n--{self.boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: {content_range(start, end, size)}\r\n\r\n'
+            ).encode('ascii')
+            for start, end in ranges
+        ]
+        self._closing = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+
+    @property
+    def content_length(self) -> int:
+        framing = sum(len(header) for header in self._part_headers) + len(self._closing)
+        return framing + sum(end - start + 1 for start, end in self.ranges)
+
+    def body(self, read_range):
+        """Yield the multipart body; read_range(start, end) yields the bytes of one part"""
+        for (start, end), header in zip(self.ranges, self._part_headers):
+            yield header
+            yield from read_range(start, end)
+        yield self._closing
@@ -0,0 +1,184 @@
+"""
+Bounded conversion job executor
+A fixed pool of worker threads per process runs EPUB conversions. Jobs are
+queued in the shared job store, so the queue (and its per-user fair
+ordering) spans every gunicorn worker on the node and survives restarts.
+Admission is capped: when the queue is full, submit() raises QueueFull and
+the API answers 429. Interactive uploads are dispatched before bulk work
+(scans and backfills), and running bulk jobs yield at a chapter boundary
+when an interactive job would otherwise have to wait.
+"""
+import os
+import time
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """The job queue (or the user's share of it) has no room left"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class JobExecutor:
+    """Fixed-size worker pool fed from the job store's queue"""
+
+    def __init__(self, store, runner, workers: int = None, max_queued: int = None, max_queued_per_user: int = None,
+                 chars_per_second=None):
+        self.store = store
+        self.runner = runner  # runner(job) converts one claimed job
+        self.chars_per_second = chars_per_second  # chars_per_second() = current synthesis rate, for sizing jobs
+        self.scheduling = os.environ.get('JOB_SCHEDULING', 'sjf').lower()  # 'sjf' or 'fifo' within a class
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.max_queued = max_queued or int(os.environ.get('JOB_QUEUE_DEPTH', 20))
+        self.max_queued_per_user = max_queued_per_user or int(os.environ.get('JOB_QUEUE_DEPTH_PER_USER', 5))
+        self.max_running = int(os.environ.get('JOB_MAX_RUNNING', 0))  # Node-wide cap, 0 = workers per process only
+        self.retry_after = int(os.environ.get('JOB_RETRY_AFTER', 60))
+        self.poll_interval = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+        self.prune_interval = float(os.environ.get('JOB_PRUNE_INTERVAL', 600))  # Finished-job cleanup
+
+        self.owner = None
+        self._running = {}  # job_id -> user_id
+        self._threads = []
+        self._heartbeat_thread = None
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self.stats = {
+            'submitted': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'yielded': 0
+        }
+
+    def start(self):
+        """Start (or restart after a fork) the worker and heartbeat threads"""
+        with self._lock:
+            owner = f"{socket.gethostname()}:{os.getpid()}"
+            if owner != self.owner:
+                # Threads don't survive a fork; this process needs its own pool
+                self.owner = owner
+                self._threads = []
+                self._heartbeat_thread = None
+                self._running = {}
+
+            alive = [thread for thread in self._threads if thread.is_alive()]
+            if len(alive) == self.workers and self._heartbeat_thread and self._heartbeat_thread.is_alive():
+                return
+            self.store.heartbeat(self.owner, self.workers)
+            if not (self._heartbeat_thread and self._heartbeat_thread.is_alive()):
+                self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+                self._heartbeat_thread.start()
+            for _ in range(self.workers - len(alive)):
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                alive.append(thread)
+            self._threads = alive
+
+    def submit(self, job_id: str, user_id: str, book_title: str, epub_key: str = None, payload: bytes = None,
+               content_key: str = None, callback: dict = None, priority: str = 'interactive',
+               text_chars: int = None) -> int:
+        """
+        Queue a conversion job
+
+        The job converts either the EPUB at epub_key in R2 or the uploaded
+        payload bytes, and reports to the callback webhook if one is given.
+        Interactive jobs are dispatched ahead of bulk ones, and with 'sjf'
+        scheduling shorter books (text_chars) ahead of longer ones. Returns
+        the job's queue position (0 = a worker is free to start it right
+        away). Raises QueueFull when the queue or the user's share of it is
+        at capacity, and lets the store's DuplicateJob through when the
+        content is already being (or has been) converted.
+        """
+        self.start()
+        rejection = self.store.enqueue(
+            job_id, user_id, book_title, epub_key=epub_key, payload=payload, content_key=content_key,
+            callback=callback, priority=priority, text_chars=text_chars, max_queued=self.max_queued,
+            max_queued_per_user=self.max_queued_per_user
+        )
+        with self._lock:
+            if rejection:
+                self.stats['rejected'] += 1
+                raise QueueFull(rejection, self.retry_after)
+            self.stats['submitted'] += 1
+            self._wake.notify()
+        return self.store.queue_position(job_id, self.size_rate()) or 0
+
+    def queue_position(self, job_id: str):
+        """Current position of a waiting job (0 = about to start), or None if it is not queued"""
+        return self.store.queue_position(job_id, self.size_rate())
+
+    def size_rate(self) -> float:
+        """Synthesis rate the store sizes queued jobs with (0 = size-blind, oldest first)"""
+        if self.scheduling != 'sjf' or not self.chars_per_second:
+            return 0
+        return self.chars_per_second()
+
+    def _worker(self):
+        while True:
+            try:
+                job = self.store.claim_next(self.owner, self.max_running, self.size_rate())
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                # Jobs queued by other processes are noticed on the next poll
+                with self._wake:
+                    self._wake.wait(self.poll_interval)
+                continue
+
+            job_id = job['job_id']
+            with self._lock:
+                self._running[job_id] = job['user_id']
+            try:
+                self.runner(job)
+                outcome = self._outcome(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} crashed: {e}")
+                self.store.update_job(job_id, status='failed', message=f'Processing failed: {e}', error=str(e))
+                outcome = 'failed'
+
+            with self._lock:
+                self._running.pop(job_id, None)
+                self.stats[outcome] += 1
+
+    def _outcome(self, job_id: str) -> str:
+        """Stats key for a job its runner returned from: it may have failed, been cancelled or yielded"""
+        job = self.store.get_job(job_id)
+        status = job['status'] if job else 'completed'
+        if status == 'queued':
+            return 'yielded'  # Gave its slot to an interactive job and waits to resume
+        return status if status in self.stats else 'completed'
+
+    def _heartbeat(self):
+        interval = self.store.owner_timeout / 4
+        next_prune = time.monotonic()
+        while True:
+            try:
+                self.store.heartbeat(self.owner, self.workers)
+                self.store.requeue_orphans()
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + self.prune_interval
+                    self.store.prune()
+            except Exception as e:
+                logger.warning(f"Job executor heartbeat failed: {e}")
+            time.sleep(interval)
+
+    def get_stats(self) -> dict:
+        """Pool metrics for this process plus node-wide queue counts"""
+        with self._lock:
+            stats = {
+                **self.stats,
+                'workers': self.workers,
+                'running': len(self._running),
+                'max_queued': self.max_queued,
+                'max_queued_per_user': self.max_queued_per_user,
+                'max_running': self.max_running,
+                'scheduling': self.scheduling
+            }
+        stats['jobs_by_status'] = self.store.count_jobs()
+        return stats
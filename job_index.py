@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Persistent job_id -> storage location index
+Each job gets a small _system/jobs/{job_id}.json record in R2, cached in memory,
+so download and status lookups resolve with at most one GET instead of probing
+every user folder or listing the whole bucket.
+
+Audiobooks created before the index existed are indexed once, by the
+scanner leader, with a _system/ marker recording that the backfill ran.
+
+Usage:
+    python job_index.py rebuild    # index every audiobook that has no record yet
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from r2_client import get_r2_client, read_json_object
+from storage_ops import delete_keys, delete_prefix, iter_objects, TOMBSTONE_PREFIX
+
+logger = logging.getLogger(__name__)
+
+INDEX_PREFIX = "_system/jobs/"
+CONTENT_PREFIX = "_system/content/"
+BACKFILL_MARKER = "_system/job_index_backfilled.json"
+TERMINAL_STATUSES = ('completed', 'failed')
+
+NEGATIVE_TTL = float(os.environ.get('JOB_INDEX_NEGATIVE_TTL', 60))
+ACTIVE_TTL = float(os.environ.get('JOB_INDEX_ACTIVE_TTL', 5))
+MAX_CACHED = int(os.environ.get('JOB_INDEX_MAX_CACHED', 10000))
+
+_cache = OrderedDict()  # job_id -> (entry or None, expires_at or None)
+_cache_lock = threading.Lock()
+
+def index_key(job_id: str) -> str:
+    """R2 key of a job's index record"""
+    return f"{INDEX_PREFIX}{job_id}.json"
+
+def metadata_key(user_id: str, job_id: str) -> str:
+    """R2 key of an audiobook's metadata"""
+    return f"{user_id}/{job_id}/metadata.json"
+
+def _cache_put(job_id: str, entry):
+    if entry is None:
+        expires_at = time.time() + NEGATIVE_TTL
+    elif entry.get('status') in TERMINAL_STATUSES:
+        expires_at = None
+    else:
+        expires_at = time.time() + ACTIVE_TTL
+
+    with _cache_lock:
+        _cache[job_id] = (entry, expires_at)
+        _cache.move_to_end(job_id)
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+
+def _cache_get(job_id: str):
+    """Return (hit, entry) from the in-memory cache"""
+    with _cache_lock:
+        cached = _cache.get(job_id)
+        if cached is None:
+            return False, None
+        entry, expires_at = cached
+        if expires_at is not None and time.time() > expires_at:
+            del _cache[job_id]
+            return False, None
+        _cache.move_to_end(job_id)
+        return True, entry
+
+def record_job(r2, bucket_name: str, job_id: str, user_id: str, status: str):
+    """Write (or overwrite) the index record for a job"""
+    entry = {
+        'job_id': job_id,
+        'user_id': user_id,
+        'metadata_key': metadata_key(user_id, job_id),
+        'status': status,
+        'updated_at': datetime.now().isoformat()
+    }
+    r2.put_object(
+        Bucket=bucket_name,
+        Key=index_key(job_id),
+        Body=json.dumps(entry),
+        ContentType='application/json'
+    )
+    _cache_put(job_id, entry)
+    return entry
+
+def lookup_job(r2, bucket_name: str, job_id: str):
+    """Return the index record for a job, or None if the job is unknown"""
+    hit, entry = _cache_get(job_id)
+    if hit:
+        return entry
+
+    entry, _ = read_json_object(r2, bucket_name, index_key(job_id))
+    _cache_put(job_id, entry)
+    return entry
+
+def content_index_key(user_id: str, content_key: str) -> str:
+    """R2 key of the record mapping a user's EPUB content hash to its job"""
+    return f"{CONTENT_PREFIX}{user_id}/{content_key}.json"
+
+def record_content(r2, bucket_name: str, user_id: str, content_key: str, job_id: str):
+    """Remember which job converts this content for this user"""
+    r2.put_object(
+        Bucket=bucket_name,
+        Key=content_index_key(user_id, content_key),
+        Body=json.dumps({'job_id': job_id, 'recorded_at': datetime.now().isoformat()}),
+        ContentType='application/json'
+    )
+
+def lookup_content(r2, bucket_name: str, user_id: str, content_key: str):
+    """
+    Index record of the user's job for this content, or None
+
+    Failed and deleted jobs don't count, so their content can be converted again.
+    """
+    record, _ = read_json_object(r2, bucket_name, content_index_key(user_id, content_key))
+    if not record:
+        return None
+    entry = lookup_job(r2, bucket_name, record['job_id'])
+    if not entry or entry['status'] == 'failed':
+        return None
+    return entry
+
+def forget_content(r2, bucket_name: str, user_id: str, job_id: str, content_keys: list = None):
+    """
+    Remove the content records pointing at a deleted job, so its EPUB can be converted again
+
+    With the job's content keys only those records are checked; otherwise
+    every content record of the user is.
+    """
+    if content_keys:
+        keys = [content_index_key(user_id, content_key) for content_key in content_keys]
+    else:
+        keys = [obj['Key'] for obj in iter_objects(r2, bucket_name, f"{CONTENT_PREFIX}{user_id}/")]
+    stale = []
+    for key in keys:
+        record, _ = read_json_object(r2, bucket_name, key)
+        if record and record.get('job_id') == job_id:
+            stale.append(key)
+    if stale:
+        delete_keys(r2, bucket_name, stale)
+
+def forget_user_content(r2, bucket_name: str, user_id: str):
+    """Remove every content record of a user"""
+    delete_prefix(r2, bucket_name, f"{CONTENT_PREFIX}{user_id}/")
+
+def forget_job(r2, bucket_name: str, job_id: str):
+    """Remove a job from the index"""
+    try:
+        r2.delete_object(Bucket=bucket_name, Key=index_key(job_id))
+    except ClientError as e:
+        logger.warning(f"Could not delete index record for job {job_id}: {e}")
+    _cache_put(job_id, None)
+
+def forget_jobs(r2, bucket_name: str, job_ids: list):
+    """Remove many jobs from the index with batched deletes"""
+    delete_keys(r2, bucket_name, [index_key(job_id) for job_id in job_ids])
+    for job_id in job_ids:
+        _cache_put(job_id, None)
+
+def rebuild_index(r2, bucket_name: str) -> int:
+    """
+    Index every audiobook that has a metadata.json but no index record
+
+    Existing records are left alone (they know a job's real status), and so
+    are audiobooks whose deletion is still pending.
+    """
+    indexed_jobs = {obj['Key'][len(INDEX_PREFIX):-len('.json')] for obj in iter_objects(r2, bucket_name, INDEX_PREFIX)}
+    deleting = [obj['Key'][len(TOMBSTONE_PREFIX):-len('.json')] + '/'
+                for obj in iter_objects(r2, bucket_name, TOMBSTONE_PREFIX)]
+    indexed = 0
+
+    for obj in iter_objects(r2, bucket_name):
+        parts = obj['Key'].split('/')
+        if len(parts) != 3 or parts[2] != 'metadata.json' or parts[0].startswith('_'):
+            continue
+        user_id, job_id = parts[0], parts[1]
+        if job_id in indexed_jobs or any(obj['Key'].startswith(prefix) for prefix in deleting):
+            continue
+        record_job(r2, bucket_name, job_id, user_id, 'completed')
+        indexed += 1
+
+    logger.info(f"Rebuilt job index: {indexed} audiobooks added")
+    return indexed
+
+def backfill_once(r2, bucket_name: str) -> int:
+    """Run rebuild_index() unless the marker says it already ran for this bucket"""
+    marker, _ = read_json_object(r2, bucket_name, BACKFILL_MARKER)
+    if marker:
+        return 0
+    indexed = rebuild_index(r2, bucket_name)
+    r2.put_object(
+        Bucket=bucket_name,
+        Key=BACKFILL_MARKER,
+        Body=json.dumps({'indexed': indexed, 'completed_at': datetime.now().isoformat()}),
+        ContentType='application/json'
+    )
+    return indexed
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print(__doc__)
+        return
+
+    r2, bucket_name = get_r2_client()
+    if not r2 or not bucket_name:
+        print("❌ R2 client not configured")
+        return
+
+    print("🔄 Rebuilding job index...")
+    indexed = rebuild_index(r2, bucket_name)
+    print(f"✅ Indexed {indexed} audiobooks")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,727 @@
+"""
+Durable conversion job store
+Jobs live in a WAL-mode SQLite database on the node's disk, so every gunicorn
+worker answers status queries from the same state and queued jobs survive
+worker restarts. The jobs table doubles as the work queue: executors claim
+the next job with an atomic UPDATE, and jobs whose owning process stopped
+heartbeating are put back in the queue. Finished jobs are compacted to a
+summary and eventually deleted, so the database stays bounded.
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('queued', 'processing')
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Priority classes, most urgent first; the jobs column stores the index
+PRIORITIES = ('interactive', 'bulk')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    user_id     TEXT NOT NULL,
+    book_title  TEXT,
+    status      TEXT NOT NULL,
+    progress    INTEGER NOT NULL DEFAULT 0,
+    message     TEXT,
+    details     TEXT NOT NULL DEFAULT '{}',
+    epub_key    TEXT,
+    payload     BLOB,
+    owner       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    version     INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    updated_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, status);
+
+CREATE TABLE IF NOT EXISTS job_chapters (
+    job_id       TEXT NOT NULL,
+    chapter      INTEGER NOT NULL,
+    entry        TEXT NOT NULL,
+    source_hash  TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (job_id, chapter)
+);
+
+CREATE TABLE IF NOT EXISTS executors (
+    owner        TEXT PRIMARY KEY,
+    slots        INTEGER NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS throughput (
+    backend           TEXT NOT NULL,
+    voice             TEXT NOT NULL,
+    chars_per_second  REAL NOT NULL,
+    samples           INTEGER NOT NULL,
+    updated_at        REAL NOT NULL,
+    PRIMARY KEY (backend, voice)
+);
+"""
+
+# Columns added after the first release: (column, definition, index created with it)
+MIGRATIONS = [
+    ('content_key', 'TEXT', 'CREATE INDEX IF NOT EXISTS idx_jobs_content ON jobs (user_id, content_key)'),
+    ('callbacks', "TEXT NOT NULL DEFAULT '[]'", None),
+    ('priority', 'INTEGER NOT NULL DEFAULT 0',
+     'CREATE INDEX IF NOT EXISTS idx_jobs_priority ON jobs (status, priority, created_at)'),
+    ('text_chars', 'INTEGER', None),
+    ('compacted_at', 'REAL', 'CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (status, finished_at)'),
+]
+
+# Details that only matter while a job runs; compaction drops them from finished jobs
+_TRANSIENT_DETAILS = ('ready_chapters', 'remaining_chars', 'cancel_requested')
+
+# Columns that update_job() writes directly; any other field goes into details
+_COLUMNS = ('status', 'progress', 'message', 'book_title', 'text_chars')
+
+class DuplicateJob(Exception):
+    """The same content is already queued, converting or converted for this user"""
+
+    def __init__(self, job: dict):
+        super().__init__(f"Duplicate of job {job['job_id']}")
+        self.job = job
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+class JobStore:
+    """SQLite-backed job state and queue shared by every process on the node"""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get(
+            'JOB_STORE_PATH', os.path.join(tempfile.gettempdir(), 'audiobook-jobs.sqlite3')
+        )
+        self.owner_timeout = float(os.environ.get('JOB_OWNER_TIMEOUT', 60))
+        self.max_attempts = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+        # Size-aware dispatch: books of unknown length count as this many characters, and
+        # every second a job waits takes SJF_AGING seconds of work off its size
+        self.default_book_chars = int(os.environ.get('JOB_DEFAULT_BOOK_CHARS', 400000))
+        self.sjf_aging = float(os.environ.get('JOB_SJF_AGING', 1))
+        # Finished jobs shrink to a summary after compact_after seconds and are deleted after
+        # retention seconds, or sooner once more than max_retained of them are kept
+        self.compact_after = float(os.environ.get('JOB_COMPACT_AFTER', 3600))
+        self.retention = float(os.environ.get('JOB_RETENTION_HOURS', 168)) * 3600
+        self.max_retained = int(os.environ.get('JOB_MAX_RETAINED', 5000))
+        self.stats = {
+            'compacted': 0,
+            'evicted': 0,
+            'last_pruned_at': None
+        }
+        self._local = threading.local()
+        self._changed = threading.Condition()  # Wakes this process's waiters on a local update
+        self._connect().executescript(SCHEMA)
+        self._migrate()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self):
+        with self.transaction() as db:
+            existing = {row['name'] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, definition, index in MIGRATIONS:
+                if column not in existing:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+                if index:
+                    db.execute(index)
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; takes the database write lock up front to avoid upgrade deadlocks"""
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _to_dict(self, row: sqlite3.Row) -> dict:
+        job = {
+            'job_id': row['job_id'],
+            'user_id': row['user_id'],
+            'book_title': row['book_title'],
+            'status': row['status'],
+            'progress': row['progress'],
+            'message': row['message'],
+            'priority': PRIORITIES[row['priority']],
+            'text_chars': row['text_chars'],
+            **json.loads(row['details']),
+            'version': row['version'],
+            'queued_at': _iso(row['created_at']),
+            'started_at': _iso(row['started_at']),
+            'updated_at': _iso(row['updated_at'])
+        }
+        if row['finished_at']:
+            job[f"{row['status']}_at"] = _iso(row['finished_at'])
+        return job
+
+    # Queue
+
+    def enqueue(self, job_id: str, user_id: str, book_title: str, epub_key: str = None, payload: bytes = None,
+                content_key: str = None, callback: dict = None, priority: str = 'interactive',
+                text_chars: int = None, max_queued: int = 0, max_queued_per_user: int = 0):
+        """
+        Add a queued job
+
+        Returns None when the job was admitted, or the reason it was turned
+        away when the queue (or the user's share of it) is full. Each
+        priority class has its own max_queued, so a bulk backfill can't
+        crowd interactive uploads out of the queue. Raises
+        DuplicateJob if the user already has a live or completed job for the
+        same content_key. callback is a webhook subscription (see
+        add_callback); it is kept out of the job state clients can read.
+        """
+        now = time.time()
+        with self.transaction() as db:
+            if content_key:
+                duplicate = self._find_content(db, user_id, content_key)
+                if duplicate:
+                    raise DuplicateJob(duplicate)
+            rank = PRIORITIES.index(priority)
+            if max_queued:
+                queued = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND priority = ?", (rank,)
+                ).fetchone()[0]
+                if queued >= max_queued:
+                    return f"Job queue is full ({queued} {priority} jobs waiting)"
+            if max_queued_per_user:
+                queued = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE user_id = ? AND status = 'queued'", (user_id,)
+                ).fetchone()[0]
+                if queued >= max_queued_per_user:
+                    return f"Too many queued jobs for this user ({queued} waiting)"
+
+            db.execute(
+                """INSERT INTO jobs (job_id, user_id, book_title, status, message, epub_key, payload,
+                                     content_key, callbacks, priority, text_chars, created_at, updated_at)
+                   VALUES (?, ?, ?, 'queued', 'Waiting for a free conversion worker...', ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, user_id, book_title, epub_key, payload, content_key,
+                 json.dumps([callback] if callback else []), rank, text_chars, now, now)
+            )
+        return None
+
+    def _find_content(self, db, user_id: str, content_key: str, exclude_job_id: str = None):
+        row = db.execute(
+            """SELECT * FROM jobs
+               WHERE user_id = ? AND content_key = ? AND job_id != ?
+                 AND status IN ('queued', 'processing', 'completed')
+               ORDER BY created_at LIMIT 1""",
+            (user_id, content_key, exclude_job_id or '')
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def find_content(self, user_id: str, content_key: str, exclude_job_id: str = None):
+        """The user's live or completed job for this content (other than exclude_job_id), or None"""
+        return self._find_content(self._connect(), user_id, content_key, exclude_job_id)
+
+    def release_content(self, user_id: str, job_id: str = None) -> list:
+        """
+        Detach the content key from a user's deleted job (or all their jobs)
+
+        The job stays in the store, but no longer counts as a conversion of
+        its EPUB. Returns the released content keys.
+        """
+        where, params = "user_id = ? AND content_key IS NOT NULL", [user_id]
+        if job_id:
+            where += " AND job_id = ?"
+            params.append(job_id)
+        with self.transaction() as db:
+            rows = db.execute(f"SELECT content_key FROM jobs WHERE {where}", params).fetchall()
+            db.execute(f"UPDATE jobs SET content_key = NULL WHERE {where}", params)
+        return [row['content_key'] for row in rows]
+
+    def claim_content(self, job_id: str, user_id: str, content_key: str):
+        """
+        Attach a content key to a running job once its bytes are known
+
+        Returns the existing job if another one already owns the content
+        (the caller should then skip the conversion), otherwise None.
+        """
+        with self.transaction() as db:
+            duplicate = self._find_content(db, user_id, content_key, exclude_job_id=job_id)
+            if duplicate:
+                return duplicate
+            db.execute("UPDATE jobs SET content_key = ? WHERE job_id = ?", (content_key, job_id))
+        return None
+
+    def claim_next(self, owner: str, max_running: int = 0, chars_per_second: float = 0):
+        """
+        Atomically take the next queued job for this owner, or None
+
+        Interactive jobs always go before bulk ones. Within a class, users
+        with the fewest running jobs go first, so one user's backlog can't
+        starve everybody else. Then, given the current synthesis rate, the
+        shortest book goes first (aged by its wait, see _size_key()); without
+        a rate, the oldest job does.
+        """
+        now = time.time()
+        with self.transaction() as db:
+            if max_running:
+                running = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'processing'").fetchone()[0]
+                if running >= max_running:
+                    return None
+
+            row = db.execute(
+                """SELECT * FROM jobs AS q WHERE status = 'queued'
+                   ORDER BY priority,
+                            (SELECT COUNT(*) FROM jobs AS r
+                             WHERE r.user_id = q.user_id AND r.status = 'processing'),
+                            ? * COALESCE(text_chars, ?) / ? - ? * (? - created_at),
+                            created_at
+                   LIMIT 1""",
+                self._size_params(now, chars_per_second)
+            ).fetchone()
+            if row is None:
+                return None
+
+            db.execute(
+                """UPDATE jobs SET status = 'processing', owner = ?, attempts = attempts + 1,
+                                   started_at = ?, updated_at = ?, version = version + 1
+                   WHERE job_id = ?""",
+                (owner, now, now, row['job_id'])
+            )
+        self._notify_change()
+        return {
+            'job_id': row['job_id'],
+            'user_id': row['user_id'],
+            'book_title': row['book_title'],
+            'epub_key': row['epub_key'],
+            'payload': row['payload'],
+            'priority': PRIORITIES[row['priority']],
+            'attempts': row['attempts'] + 1
+        }
+
+    def heartbeat(self, owner: str, slots: int):
+        """Mark an executor process as alive with its number of worker slots"""
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO executors (owner, slots, heartbeat_at) VALUES (?, ?, ?)",
+                (owner, slots, time.time())
+            )
+
+    def requeue_orphans(self) -> int:
+        """Put jobs whose owner stopped heartbeating back in the queue (or fail them after max_attempts)"""
+        now = time.time()
+        cutoff = now - self.owner_timeout
+        with self.transaction() as db:
+            db.execute("DELETE FROM executors WHERE heartbeat_at < ?", (cutoff,))
+            orphans = db.execute(
+                """SELECT job_id, attempts, json_extract(details, '$.cancel_requested') AS cancel_requested
+                   FROM jobs
+                   WHERE status = 'processing' AND (owner IS NULL OR owner NOT IN (SELECT owner FROM executors))"""
+            ).fetchall()
+            for orphan in orphans:
+                if orphan['cancel_requested']:
+                    db.execute(
+                        """UPDATE jobs SET status = 'cancelled', owner = NULL, payload = NULL,
+                                           message = 'Cancelled', finished_at = ?, updated_at = ?,
+                                           version = version + 1
+                           WHERE job_id = ?""",
+                        (now, now, orphan['job_id'])
+                    )
+                elif orphan['attempts'] >= self.max_attempts:
+                    db.execute(
+                        """UPDATE jobs SET status = 'failed', owner = NULL, payload = NULL,
+                                           message = 'Processing failed: worker stopped too many times',
+                                           finished_at = ?, updated_at = ?, version = version + 1
+                           WHERE job_id = ?""",
+                        (now, now, orphan['job_id'])
+                    )
+                else:
+                    db.execute(
+                        """UPDATE jobs SET status = 'queued', owner = NULL,
+                                           message = 'Worker restarted, waiting to resume...',
+                                           updated_at = ?, version = version + 1
+                           WHERE job_id = ?""",
+                        (now, orphan['job_id'])
+                    )
+        if orphans:
+            logger.warning(f"♻️ Recovered {len(orphans)} job(s) from stopped workers")
+        return len(orphans)
+
+    def _size_params(self, now: float, chars_per_second: float) -> tuple:
+        # Parameters of claim_next()'s size term, which is 0 (no effect) without a rate
+        if not chars_per_second:
+            return (0, 0, 1, 0, now)
+        return (1, self.default_book_chars, chars_per_second, self.sjf_aging, now)
+
+    def _size_key(self, row, now: float, chars_per_second: float) -> float:
+        """
+        Expected synthesis seconds of a queued job minus its aged wait
+
+        Shortest-expected-job-first cuts the mean wait under mixed load; the
+        aging term lets a long book that has waited long enough go ahead of
+        newer short ones, so it is never starved.
+        """
+        weight, default_chars, rate, aging, now = self._size_params(now, chars_per_second)
+        chars = row['text_chars'] if row['text_chars'] is not None else default_chars
+        return weight * chars / rate - aging * (now - row['created_at'])
+
+    def dispatch_order(self, chars_per_second: float = 0) -> list:
+        """Queued jobs in the order claim_next() will hand them out"""
+        db = self._connect()
+        now = time.time()
+        queued = db.execute(
+            """SELECT job_id, user_id, priority, text_chars, created_at FROM jobs
+               WHERE status = 'queued' ORDER BY created_at"""
+        ).fetchall()
+        running = {
+            row['user_id']: row['running'] for row in db.execute(
+                "SELECT user_id, COUNT(*) AS running FROM jobs WHERE status = 'processing' GROUP BY user_id"
+            )
+        }
+
+        # Replay claim_next() over the current queue
+        pending = [(row, self._size_key(row, now, chars_per_second)) for row in queued]
+        order = []
+        while pending:
+            index = min(
+                range(len(pending)),
+                key=lambda i: (pending[i][0]['priority'], running.get(pending[i][0]['user_id'], 0), pending[i][1], i)
+            )
+            row, _ = pending.pop(index)
+            order.append({'job_id': row['job_id'], 'user_id': row['user_id'], 'text_chars': row['text_chars']})
+            running[row['user_id']] = running.get(row['user_id'], 0) + 1
+        return order
+
+    def queue_position(self, job_id: str, chars_per_second: float = 0):
+        """
+        Position of a queued job in dispatch order, discounting idle worker slots
+
+        0 means a free worker will start it right away; None means the job is
+        not queued.
+        """
+        order = self.dispatch_order(chars_per_second)
+        for position, job in enumerate(order, 1):
+            if job['job_id'] == job_id:
+                return max(position - self.idle_slots(), 0)
+        return None
+
+    def idle_slots(self) -> int:
+        """Worker slots on the node that no running job is using"""
+        db = self._connect()
+        running = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'processing'").fetchone()[0]
+        return max(self._slots(db) - running, 0)
+
+    def worker_slots(self) -> int:
+        """Worker slots of the executors that are alive"""
+        return self._slots(self._connect())
+
+    def _slots(self, db) -> int:
+        """Worker slots of the executors that are alive"""
+        return db.execute(
+            "SELECT COALESCE(SUM(slots), 0) FROM executors WHERE heartbeat_at >= ?",
+            (time.time() - self.owner_timeout,)
+        ).fetchone()[0]
+
+    def should_yield(self, job_id: str) -> bool:
+        """
+        Whether a running bulk job should give its slot to a waiting interactive job
+
+        Only as many bulk jobs yield as there are interactive jobs that no idle
+        slot can take, most recently started first, so the longest-running
+        backfill keeps going.
+        """
+        db = self._connect()
+        waiting = db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND priority < ?", (PRIORITIES.index('bulk'),)
+        ).fetchone()[0]
+        if not waiting:
+            return False
+        running = db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'processing'").fetchone()[0]
+        needed = waiting - max(self._slots(db) - running, 0)
+        if needed <= 0:
+            return False
+        rows = db.execute(
+            """SELECT job_id FROM jobs WHERE status = 'processing' AND priority = ?
+               ORDER BY started_at DESC LIMIT ?""",
+            (PRIORITIES.index('bulk'), needed)
+        ).fetchall()
+        return any(row['job_id'] == job_id for row in rows)
+
+    def requeue_job(self, job_id: str, message: str):
+        """Put a running job that yielded its slot back in the queue; yielding doesn't use up an attempt"""
+        now = time.time()
+        with self.transaction() as db:
+            db.execute(
+                """UPDATE jobs SET status = 'queued', owner = NULL, attempts = MAX(attempts - 1, 0), message = ?,
+                                   details = json_set(details, '$.preemptions',
+                                                      COALESCE(json_extract(details, '$.preemptions'), 0) + 1),
+                                   updated_at = ?, version = version + 1
+                   WHERE job_id = ? AND status = 'processing'""",
+                (message, now, job_id)
+            )
+        self._notify_change()
+
+    # Job state
+
+    def update_job(self, job_id: str, **fields):
+        """
+        Update a job's state
+
+        status, progress, message and book_title are columns; any other field
+        is kept in the job's details. Reaching a terminal status releases the
+        job and drops its queued payload.
+        """
+        now = time.time()
+        columns = {name: fields.pop(name) for name in _COLUMNS if name in fields}
+        with self.transaction() as db:
+            row = db.execute("SELECT details FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            details = json.loads(row['details'])
+            details.update(fields)
+
+            assignments = [f"{name} = ?" for name in columns]
+            values = list(columns.values())
+            if columns.get('status') in TERMINAL_STATUSES:
+                assignments += ["finished_at = ?", "owner = NULL", "payload = NULL"]
+                values.append(now)
+            assignments += ["details = ?", "updated_at = ?", "version = version + 1"]
+            values += [json.dumps(details), now, job_id]
+            db.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE job_id = ?", values)
+        self._notify_change()
+
+    def _notify_change(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for_update(self, job_id: str, since: int, timeout: float, interval: float = 0.5):
+        """
+        Block until a job's version is past since, or timeout seconds pass
+
+        Returns the job's state either way (compare its version to tell), or
+        None if the store doesn't know the job. Updates made in this process
+        wake the waiter at once; updates from other processes are picked up
+        within interval seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get_job(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job['version'] > since or job['status'] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(interval, remaining))
+
+    def cancel_job(self, job_id: str, reason: str = 'Cancelled'):
+        """
+        Cancel a job, returning its new state (None if unknown)
+
+        A queued job is cancelled on the spot. A running one is flagged with
+        cancel_requested; its worker notices (see cancel_requested()), stops
+        and cleans up, then marks it cancelled. Finished jobs are returned
+        unchanged.
+        """
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute("SELECT status, details FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            details = json.loads(row['details'])
+            if row['status'] == 'queued':
+                details['cancel_reason'] = reason
+                db.execute(
+                    """UPDATE jobs SET status = 'cancelled', message = ?, details = ?, payload = NULL,
+                                       finished_at = ?, updated_at = ?, version = version + 1
+                       WHERE job_id = ?""",
+                    (reason, json.dumps(details), now, now, job_id)
+                )
+            elif row['status'] == 'processing' and not details.get('cancel_requested'):
+                details.update(cancel_requested=True, cancel_reason=reason)
+                db.execute(
+                    """UPDATE jobs SET message = 'Cancelling...', details = ?, updated_at = ?,
+                                       version = version + 1
+                       WHERE job_id = ?""",
+                    (json.dumps(details), now, job_id)
+                )
+        self._notify_change()
+        return self.get_job(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        """Whether a running job has been asked to stop"""
+        row = self._connect().execute(
+            "SELECT json_extract(details, '$.cancel_requested') FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def find_superseded(self, user_id: str, book_title: str, content_key: str, job_id: str) -> list:
+        """The user's older live jobs for the same title but other (or not yet known) content than job_id's"""
+        rows = self._connect().execute(
+            """SELECT job_id FROM jobs
+               WHERE user_id = ? AND book_title = ? AND job_id != ? AND status IN ('queued', 'processing')
+                 AND (content_key IS NULL OR content_key != ?)
+                 AND created_at <= (SELECT created_at FROM jobs WHERE job_id = ?)""",
+            (user_id, book_title, job_id, content_key, job_id)
+        ).fetchall()
+        return [row['job_id'] for row in rows]
+
+    def record_chapter(self, job_id: str, entry: dict):
+        """Checkpoint a converted chapter (entry carries 'chapter' and 'source_hash')"""
+        with self.transaction() as db:
+            db.execute(
+                """INSERT OR REPLACE INTO job_chapters (job_id, chapter, entry, source_hash, completed_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (job_id, entry['chapter'], json.dumps(entry), entry['source_hash'], time.time())
+            )
+
+    def delete_chapters(self, job_id: str):
+        """Drop a job's chapter checkpoints"""
+        with self.transaction() as db:
+            db.execute("DELETE FROM job_chapters WHERE job_id = ?", (job_id,))
+
+    def get_chapters(self, job_id: str) -> list:
+        """Checkpointed chapters of a job, in chapter order"""
+        rows = self._connect().execute(
+            "SELECT entry FROM job_chapters WHERE job_id = ? ORDER BY chapter", (job_id,)
+        ).fetchall()
+        return [json.loads(row['entry']) for row in rows]
+
+    def add_callback(self, job_id: str, callback: dict) -> bool:
+        """Subscribe a webhook ({'url', 'secret', ...}) to a job; False if the job is unknown"""
+        with self.transaction() as db:
+            row = db.execute("SELECT callbacks FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            callbacks = json.loads(row['callbacks']) + [callback]
+            db.execute("UPDATE jobs SET callbacks = ? WHERE job_id = ?", (json.dumps(callbacks), job_id))
+        return True
+
+    def get_callbacks(self, job_id: str) -> list:
+        """Webhook subscriptions of a job"""
+        row = self._connect().execute("SELECT callbacks FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row['callbacks']) if row else []
+
+    # Retention
+
+    def prune(self) -> tuple:
+        """
+        Shrink the record of finished jobs, returning (compacted, evicted)
+
+        Jobs finished more than compact_after seconds ago keep only their
+        summary: chapter checkpoints, webhook subscriptions and per-chapter
+        progress are dropped. Jobs past the retention period, and the oldest
+        beyond max_retained finished jobs, are deleted; completed ones are
+        still found through the R2 job index. Queued and running jobs are
+        never touched. SQLite reuses the freed pages, so the file stops
+        growing rather than shrinking.
+        """
+        now = time.time()
+        terminal = ', '.join('?' * len(TERMINAL_STATUSES))
+        compactable = f"status IN ({terminal}) AND compacted_at IS NULL AND finished_at < ?"
+        evictable = (f"(status IN ({terminal}) AND finished_at < ?) OR job_id IN "
+                     f"(SELECT job_id FROM jobs WHERE status IN ({terminal}) ORDER BY finished_at DESC LIMIT -1 OFFSET ?)")
+        compact_params = (*TERMINAL_STATUSES, now - self.compact_after)
+        evict_params = (*TERMINAL_STATUSES, now - self.retention, *TERMINAL_STATUSES, self.max_retained)
+        transient = ', '.join(f"'$.{name}'" for name in _TRANSIENT_DETAILS)
+
+        with self.transaction() as db:
+            db.execute(f"DELETE FROM job_chapters WHERE job_id IN (SELECT job_id FROM jobs WHERE {compactable})",
+                       compact_params)
+            compacted = db.execute(
+                f"""UPDATE jobs SET details = json_remove(details, {transient}), callbacks = '[]', payload = NULL,
+                                   compacted_at = ?
+                    WHERE {compactable}""",
+                (now, *compact_params)
+            ).rowcount
+            db.execute(f"DELETE FROM job_chapters WHERE job_id IN (SELECT job_id FROM jobs WHERE {evictable})",
+                       evict_params)
+            evicted = db.execute(f"DELETE FROM jobs WHERE {evictable}", evict_params).rowcount
+
+        self.stats['compacted'] += compacted
+        self.stats['evicted'] += evicted
+        self.stats['last_pruned_at'] = _iso(now)
+        if compacted or evicted:
+            logger.info(f"🧹 Job store: compacted {compacted} finished jobs, evicted {evicted}")
+        return compacted, evicted
+
+    def get_stats(self) -> dict:
+        """How much the store holds: job rows, checkpoints and bytes on disk"""
+        db = self._connect()
+        jobs = db.execute(
+            """SELECT COUNT(*) AS jobs, COUNT(compacted_at) AS compacted,
+                      COALESCE(SUM(LENGTH(details) + LENGTH(callbacks)), 0) AS details_bytes,
+                      COALESCE(SUM(LENGTH(payload)), 0) AS payload_bytes
+               FROM jobs"""
+        ).fetchone()
+        checkpoints = db.execute(
+            "SELECT COUNT(*) AS chapters, COALESCE(SUM(LENGTH(entry)), 0) AS bytes FROM job_chapters"
+        ).fetchone()
+        page_size = db.execute('PRAGMA page_size').fetchone()[0]
+        return {
+            'jobs': jobs['jobs'],
+            'compacted_jobs': jobs['compacted'],
+            'chapter_checkpoints': checkpoints['chapters'],
+            'details_bytes': jobs['details_bytes'],
+            'payload_bytes': jobs['payload_bytes'],
+            'checkpoint_bytes': checkpoints['bytes'],
+            'db_bytes': db.execute('PRAGMA page_count').fetchone()[0] * page_size,
+            'free_bytes': db.execute('PRAGMA freelist_count').fetchone()[0] * page_size,
+            'max_retained': self.max_retained,
+            'retention_hours': self.retention / 3600,
+            **self.stats
+        }
+
+    # Throughput
+
+    def get_throughput(self, backend: str, voice: str):
+        """(chars_per_second, samples) learned for a backend and voice, or None"""
+        row = self._connect().execute(
+            "SELECT chars_per_second, samples FROM throughput WHERE backend = ? AND voice = ?", (backend, voice)
+        ).fetchone()
+        return (row['chars_per_second'], row['samples']) if row else None
+
+    def record_throughput(self, backend: str, voice: str, chars_per_second: float, alpha: float):
+        """Fold one job's measured rate into the backend and voice's moving average"""
+        with self.transaction() as db:
+            db.execute(
+                """INSERT INTO throughput (backend, voice, chars_per_second, samples, updated_at)
+                   VALUES (?, ?, ?, 1, ?)
+                   ON CONFLICT (backend, voice) DO UPDATE SET
+                       chars_per_second = (1 - ?) * chars_per_second + ? * excluded.chars_per_second,
+                       samples = samples + 1,
+                       updated_at = excluded.updated_at""",
+                (backend, voice, chars_per_second, time.time(), alpha, alpha)
+            )
+
+    def get_job(self, job_id: str):
+        """A job's current state, or None if the store doesn't know it"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, status: str, limit: int = 100) -> list:
+        """Jobs in one status, oldest first"""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (status, limit)
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count_jobs(self) -> dict:
+        """Number of jobs in each status"""
+        rows = self._connect().execute("SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status")
+        return {row['status']: row['jobs'] for row in rows}
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Per-user audiobook library manifest
+Keeps {user_id}/library.json in step with each audiobook's metadata.json so
+listing a library costs one GET instead of one GET per book.
+
+Usage:
+    python library_manifest.py rebuild            # every user in the bucket
+    python library_manifest.py rebuild USER_ID    # a single user
+"""
+import sys
+import logging
+from datetime import datetime
+
+from r2_client import get_r2_client, read_json_object, update_json_object
+
+logger = logging.getLogger(__name__)
+
+def library_key(user_id: str) -> str:
+    """R2 key of a user's library manifest"""
+    return f"{user_id}/library.json"
+
+def library_entry(metadata: dict) -> dict:
+    """Library listing entry for an audiobook's metadata"""
+    return {
+        'id': metadata['job_id'],
+        'title': metadata['book_title'],
+        'chapters': len(metadata['chapters']),
+        'status': metadata.get('status', 'completed'),
+        'created_at': metadata['created_at'],
+        'download_url': f'/api/download/{metadata["job_id"]}'
+    }
+
+def _empty_manifest(user_id: str) -> dict:
+    return {
+        'user_id': user_id,
+        'audiobooks': {},
+        'updated_at': datetime.now().isoformat()
+    }
+
+def load_library(r2, bucket_name: str, user_id: str):
+    """Return the user's audiobooks sorted by creation time, or None if there is no manifest yet"""
+    manifest, _ = read_json_object(r2, bucket_name, library_key(user_id))
+    if manifest is None:
+        return None
+    return sorted(manifest.get('audiobooks', {}).values(), key=lambda book: book.get('created_at', ''))
+
+def upsert_audiobook(r2, bucket_name: str, user_id: str, metadata: dict):
+    """Add or replace an audiobook in the user's manifest"""
+    entry = library_entry(metadata)
+
+    def mutate(manifest):
+        manifest = manifest or _empty_manifest(user_id)
+        manifest['audiobooks'][entry['id']] = entry
+        manifest['updated_at'] = datetime.now().isoformat()
+        return manifest
+
+    update_json_object(r2, bucket_name, library_key(user_id), mutate)
+
+def remove_audiobook(r2, bucket_name: str, user_id: str, audiobook_id: str):
+    """Drop an audiobook from the user's manifest"""
+    def mutate(manifest):
+        if not manifest or audiobook_id not in manifest.get('audiobooks', {}):
+            return None
+        del manifest['audiobooks'][audiobook_id]
+        manifest['updated_at'] = datetime.now().isoformat()
+        return manifest
+
+    update_json_object(r2, bucket_name, library_key(user_id), mutate)
+
+def rebuild_library(r2, bucket_name: str, user_id: str) -> list:
+    """Regenerate a user's manifest from the metadata.json of every audiobook"""
+    audiobooks = {}
+    paginator = r2.get_paginator('list_objects_v2')
+
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=f"{user_id}/", Delimiter='/'):
+        for obj in page.get('CommonPrefixes', []):
+            metadata_key = f"{obj['Prefix']}metadata.json"
+            try:
+                metadata, _ = read_json_object(r2, bucket_name, metadata_key)
+                if metadata:
+                    entry = library_entry(metadata)
+                    audiobooks[entry['id']] = entry
+            except Exception as e:
+                logger.warning(f"Could not load metadata for {metadata_key}: {e}")
+
+    def mutate(_):
+        manifest = _empty_manifest(user_id)
+        manifest['audiobooks'] = audiobooks
+        return manifest
+
+    update_json_object(r2, bucket_name, library_key(user_id), mutate)
+    logger.info(f"Rebuilt library manifest for user {user_id}: {len(audiobooks)} audiobooks")
+    return sorted(audiobooks.values(), key=lambda book: book.get('created_at', ''))
+
+def list_user_ids(r2, bucket_name: str) -> list:
+    """All top-level user folders in the bucket"""
+    user_ids = []
+    paginator = r2.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Delimiter='/'):
+        for obj in page.get('CommonPrefixes', []):
+            user_id = obj['Prefix'].rstrip('/')
+            if not user_id.startswith('_'):  # _system/ and other service folders
+                user_ids.append(user_id)
+    return user_ids
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print(__doc__)
+        return
+
+    r2, bucket_name = get_r2_client()
+    if not r2 or not bucket_name:
+        print("❌ R2 client not configured")
+        return
+
+    user_ids = sys.argv[2:] or list_user_ids(r2, bucket_name)
+    print(f"🔄 Rebuilding library manifests for {len(user_ids)} user(s)...")
+
+    for user_id in user_ids:
+        try:
+            audiobooks = rebuild_library(r2, bucket_name, user_id)
+            print(f"  ✅ {user_id}: {len(audiobooks)} audiobooks")
+        except Exception as e:
+            print(f"  ❌ {user_id}: {e}")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -4,23 +4,20 @@ Simple R2 Storage Analyzer
 Lists contents of your R2 bucket to understand the structure
 """
 
-import os
 import json
-import boto3
 from collections import defaultdict
 from datetime import datetime
 
+from r2_client import get_r2_client as get_shared_r2_client
+
 # Don't load .env files as they contain template values
 
 def get_r2_client():
     """Initialize R2 client"""
     # Get R2 credentials from environment variables
-    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
-    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
-    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
-    r2_bucket = os.environ.get('R2_BUCKET_NAME', 'ebuppool')
+    r2, r2_bucket = get_shared_r2_client()
     
-    if not all([r2_endpoint, r2_access_key, r2_secret_key]):
+    if not r2:
         print("❌ R2 credentials not found in environment variables")
         print("Set these environment variables:")
         print("  export R2_ENDPOINT_URL='https://your-account-id.r2.cloudflarestorage.com'")
@@ -29,15 +26,7 @@ def get_r2_client():
         print("  export R2_BUCKET_NAME='ebuppool'")
         return None, None
     
-    r2 = boto3.client(
-        's3',
-        endpoint_url=r2_endpoint,
-        aws_access_key_id=r2_access_key,
-        aws_secret_access_key=r2_secret_key,
-        region_name='auto'
-    )
-    
-    return r2, r2_bucket
+    return r2, r2_bucket or 'ebuppool'
 
 def list_bucket_contents(r2, bucket_name, max_objects=100):
     """List bucket contents with analysis"""
@@ -1,20 +1,25 @@
 import os
 import logging
 import re
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, redirect
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.http import http_date, unquote_etag
 from flask_cors import CORS
 import asyncio
 from pathlib import Path
-import tempfile
 import uuid
 from datetime import datetime
-import boto3
 from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
 import json
 import threading
 import time
 import base64
+import sys
+import hashlib
 import secrets
+from collections import OrderedDict
 import qrcode
 from io import BytesIO
 
@@ -22,12 +27,32 @@ from io import BytesIO
 from edge_tts_service import EdgeTTSService
 from coqui_tts_service import AdvancedTTSService
 
+# Cloudflare R2 storage (shared pooled client)
+from r2_client import (
+    get_r2_client, get_r2_stats, read_json_object, presigned_get_url, head_object_cached, invalidate_head_cache
+)
+import library_manifest
+import job_index
+import storage_ops
+from audio_cache import AudioCache, next_chapter_key, file_body, read_file_range
+from http_ranges import (
+    RangeNotSatisfiable, MultipartByteranges, parse_range_header, content_range, unsatisfiable_content_range
+)
+from epub_scanner import EpubScanner
+from epub_ledger import ProcessedLedger, LeaderLease
+from job_store import JobStore, DuplicateJob, ACTIVE_STATUSES, TERMINAL_STATUSES, PRIORITIES
+from job_executor import JobExecutor, QueueFull
+from webhooks import WebhookSender, validate_callback_url
+from throughput_model import ThroughputModel, count_text_chars
+from epub_reader import EpubReader
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # Heroku router terminates TLS
 CORS(app)
 
 # Initialize advanced TTS service (Coqui + EdgeTTS fallback)
@@ -47,30 +72,80 @@ def init_tts_sync():
     loop.run_until_complete(initialize_tts())
     loop.close()
 
+# Voice every chapter is synthesized with
+TTS_VOICE = os.environ.get('TTS_VOICE', 'en-US-AriaNeural')
+
+# Chapters of one book synthesized at once, per backend. EdgeTTS throttles a single
+# client beyond a handful of concurrent requests; Coqui runs on the local CPU.
+TTS_CONCURRENCY_DEFAULTS = {'edge': 4, 'coqui': 1}
+
+# Bump when extraction or synthesis changes the audio, so older conversions aren't reused
+PIPELINE_VERSION = '2'
+
+# Chapter upload pipeline: synthesis hands MP3 bytes to a pool of uploaders
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 3))
+UPLOAD_QUEUE_DEPTH = int(os.environ.get('UPLOAD_QUEUE_DEPTH', 4))
+upload_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('UPLOAD_THREADS', 8)),
+    thread_name_prefix='r2-upload'
+)
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD_MB', 16)) * 1024 * 1024,
+    multipart_chunksize=int(os.environ.get('UPLOAD_MULTIPART_CHUNK_MB', 8)) * 1024 * 1024,
+    max_concurrency=int(os.environ.get('UPLOAD_MULTIPART_CONCURRENCY', 4)),
+    use_threads=True
+)
+
+# Per-connection buffer cap when proxying audio from R2 (hard limit 1 MB)
+STREAM_CHUNK_SIZE = min(int(os.environ.get('STREAM_CHUNK_KB', 64)), 1024) * 1024
+
+# Chapter delivery: 'proxy' streams bytes through Flask, 'redirect' makes /api/stream
+# answer with a 302 to a presigned R2 URL, 'presigned' also puts presigned URLs
+# straight into /api/download responses
+AUDIO_DELIVERY_MODE = os.environ.get('AUDIO_DELIVERY_MODE', 'proxy').lower()
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+
+def public_base_url() -> str:
+    """Base URL clients should use to reach this service"""
+    return PUBLIC_BASE_URL or request.host_url.rstrip('/')
+
+# Chapter MP3s are written once per job, so clients may cache them for a year
+AUDIO_IMMUTABLE_MAX_AGE = int(os.environ.get('AUDIO_IMMUTABLE_MAX_AGE', 31536000))
+
+# Local disk cache of streamed chapters (shared by all workers on this node)
+audio_cache = AudioCache() if os.environ.get('AUDIO_CACHE_ENABLED', 'true').lower() == 'true' else None
+
+# Job state and queue live in a node-local SQLite store shared by every gunicorn worker;
+# conversions run on a fixed pool (JOB_WORKERS) behind a bounded, per-user fair queue
+job_store = JobStore()
+throughput = ThroughputModel(job_store)
+job_executor = JobExecutor(
+    job_store, lambda job: run_job(job),
+    chars_per_second=lambda: throughput.chars_per_second(tts_service.backend, TTS_VOICE)
+)
+
+# Push-style job progress: SSE streams send a comment every KEEPALIVE seconds (Heroku's
+# router drops connections idle for 55 s) and end after STREAM_SECONDS, when EventSource
+# reconnects with Last-Event-ID. Long-polls answer within Heroku's 30 s first-byte limit.
+JOB_EVENTS_KEEPALIVE = float(os.environ.get('JOB_EVENTS_KEEPALIVE', 15))
+JOB_EVENTS_STREAM_SECONDS = float(os.environ.get('JOB_EVENTS_STREAM_SECONDS', 300))
+JOB_EVENTS_POLL_INTERVAL = float(os.environ.get('JOB_EVENTS_POLL_INTERVAL', 0.5))
+JOB_LONG_POLL_MAX_TIMEOUT = 25
+
+# Progress and completion callbacks for jobs submitted with a callback_url
+webhook_sender = WebhookSender()
+
+# A running job checks for cancellation (and whether bulk work should yield) this often;
+# a cancelled one waits up to DRAIN_TIMEOUT for in-flight uploads before cleaning up
+JOB_CANCEL_POLL_INTERVAL = float(os.environ.get('JOB_CANCEL_POLL_INTERVAL', 1))
+JOB_CANCEL_DRAIN_TIMEOUT = float(os.environ.get('JOB_CANCEL_DRAIN_TIMEOUT', 30))
+
 # Initialize TTS in background thread
 import threading
 tts_init_thread = threading.Thread(target=init_tts_sync)
 tts_init_thread.daemon = True
 tts_init_thread.start()
 
-# Cloudflare R2 storage
-def get_r2_client():
-    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
-    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
-    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
-    r2_bucket = os.environ.get('R2_BUCKET_NAME')
-    
-    if r2_endpoint and r2_access_key and r2_secret_key:
-        r2 = boto3.client(
-            's3',
-            endpoint_url=r2_endpoint,
-            aws_access_key_id=r2_access_key,
-            aws_secret_access_key=r2_secret_key,
-            region_name='auto'  # Cloudflare R2 uses 'auto'
-        )
-        return r2, r2_bucket
-    return None, None
-
 @app.route('/')
 def home():
     return jsonify({
@@ -83,8 +158,13 @@ def home():
             'process_epub': '/api/process-epub (POST)',
             'process_all_epubs': '/api/process-all-epubs (POST)',
             'list_audiobooks': '/api/audiobooks/{user_id}',
+            'delete_audiobook': '/api/audiobooks/{user_id}/{audiobook_id} (DELETE)',
+            'purge_user': '/api/audiobooks/{user_id} (DELETE)',
             'download_audiobook': '/api/download/{audiobook_id}',
             'job_status': '/api/job-status/{job_id}',
+            'job_poll': '/api/jobs/{job_id}?since={version}',
+            'job_events': '/api/jobs/{job_id}/events (SSE)',
+            'cancel_job': '/api/jobs/{job_id} (DELETE)',
             'processing_status': '/api/processing-status',
             'generate_auth_qr': '/api/generate-auth-qr/{user_id}',
             'verify_auth_token': '/api/verify-auth-token/{token}'
@@ -110,7 +190,14 @@ def health():
         'tts_quality': tts_info['quality'],
         'storage': f'cloudflare_r2_{storage_status}',
         'r2_scanner': 'active',
-        'processed_epubs': len(processed_epubs),
+        'processed_epubs': get_processed_count(),
+        'r2_pool': get_r2_stats(),
+        'audio_cache': audio_cache.get_stats() if audio_cache else 'disabled',
+        'job_executor': job_executor.get_stats(),
+        'job_store': job_store.get_stats(),
+        'auth_tokens': auth_tokens.get_stats(),
+        'webhooks': webhook_sender.get_stats(),
+        'throughput': throughput.get_stats(tts_service.backend, TTS_VOICE),
         'features': tts_info.get('features', {}),
         'timestamp': datetime.now().isoformat()
     })
@@ -119,34 +206,18 @@ def health():
 def get_job_status(job_id):
     """Get processing status for a specific job"""
     try:
-        if job_id in processing_jobs:
-            return jsonify(processing_jobs[job_id])
+        job_info = job_store.get_job(job_id)
+        if job_info:
+            return jsonify(job_state(job_info))
         
-        # Check if job is completed by looking for metadata in R2
+        # Jobs from before the store existed (or from another dyno): resolve through the index
         r2, bucket_name = get_r2_client()
         if not r2 or not bucket_name:
             return jsonify({'error': 'Storage not available'}), 500
         
-        # Search for metadata across all user folders
-        response = r2.list_objects_v2(Bucket=bucket_name, Prefix="")
-        
-        for obj in response.get('Contents', []):
-            if f'/{job_id}/metadata.json' in obj['Key']:
-                try:
-                    metadata_obj = r2.get_object(Bucket=bucket_name, Key=obj['Key'])
-                    metadata = json.loads(metadata_obj['Body'].read())
-                    
-                    return jsonify({
-                        'job_id': job_id,
-                        'status': 'completed',
-                        'progress': 100,
-                        'book_title': metadata.get('book_title', 'Unknown'),
-                        'chapters': len(metadata.get('chapters', [])),
-                        'completed_at': metadata.get('created_at'),
-                        'message': f'Audiobook ready with {len(metadata.get("chapters", []))} chapters'
-                    })
-                except Exception as e:
-                    logger.error(f"Error reading metadata for job {job_id}: {e}")
+        job_info = indexed_job_state(job_id)
+        if job_info:
+            return jsonify(job_info)
         
         # Job not found
         return jsonify({
@@ -159,24 +230,224 @@ def get_job_status(job_id):
         logger.error(f"Job status check failed: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Versions of jobs known only to the R2 job index, which just moves from running to finished
+INDEXED_LIVE_VERSION = 1
+INDEXED_FINISHED_VERSION = 2
+
+def indexed_job_state(job_id: str):
+    """
+    State of a job this node's store doesn't know (pruned, or converted on
+    another dyno) from the R2 job index, or None if it is unknown there too
+    """
+    r2, bucket_name = get_r2_client()
+    if not r2 or not bucket_name:
+        return None
+    
+    entry = job_index.lookup_job(r2, bucket_name, job_id)
+    if entry and entry['status'] == 'completed':
+        try:
+            metadata_obj = r2.get_object(Bucket=bucket_name, Key=entry['metadata_key'])
+            metadata = json.loads(metadata_obj['Body'].read())
+            
+            return {
+                'job_id': job_id,
+                'status': 'completed',
+                'progress': 100,
+                'book_title': metadata.get('book_title', 'Unknown'),
+                'chapters': len(metadata.get('chapters', [])),
+                'completed_at': metadata.get('created_at'),
+                'message': f'Audiobook ready with {len(metadata.get("chapters", []))} chapters',
+                'version': INDEXED_FINISHED_VERSION
+            }
+        except Exception as e:
+            logger.error(f"Error reading metadata for job {job_id}: {e}")
+    elif entry:
+        # Known job that is running (or failed) in another worker
+        return {
+            'job_id': job_id,
+            'user_id': entry['user_id'],
+            'status': entry['status'],
+            'updated_at': entry['updated_at'],
+            'message': 'Processing failed' if entry['status'] == 'failed' else 'Job is being processed',
+            'version': INDEXED_FINISHED_VERSION if entry['status'] in TERMINAL_STATUSES else INDEXED_LIVE_VERSION
+        }
+    return None
+
+def wait_for_job(job_id: str, since: int, timeout: float):
+    """
+    A job's state once its version is past since, or after timeout seconds
+
+    Jobs in this node's store wake the waiter as they change; others are
+    followed through the R2 job index, re-read as often as its cache allows.
+    Returns None if neither knows the job.
+    """
+    job_info = job_store.wait_for_update(job_id, since, timeout, JOB_EVENTS_POLL_INTERVAL)
+    if job_info is not None:
+        return job_info
+    
+    deadline = time.monotonic() + timeout
+    while True:
+        job_info = indexed_job_state(job_id)
+        remaining = deadline - time.monotonic()
+        if job_info is None or job_info['version'] > since or job_info['status'] in TERMINAL_STATUSES or remaining <= 0:
+            return job_info
+        time.sleep(min(job_index.ACTIVE_TTL, remaining))
+
+def job_state(job_info: dict) -> dict:
+    """A stored job as reported to clients, with its queue position while it waits and its ETA"""
+    if 'queued_at' not in job_info:
+        return job_info  # Known only to the job index: no queue or size to report
+    if job_info['status'] == 'queued':
+        job_info['queue_position'] = job_executor.queue_position(job_info['job_id'])
+    if job_info['status'] in ('queued', 'processing'):
+        eta = job_eta_seconds(job_info)
+        job_info['eta_seconds'] = round(eta)
+        job_info['estimated_completion'] = datetime.fromtimestamp(time.time() + eta).isoformat()
+    return job_info
+
+def job_eta_seconds(job_info: dict) -> float:
+    """
+    Seconds until a queued or running job should be done, from the throughput model
+
+    A running job has its remaining characters left to synthesize. A queued
+    one first waits for the work ahead of it (the rest of the running jobs
+    and the queued jobs dispatched before it) spread over the node's slots.
+    """
+    backend = tts_service.backend
+    
+    def remaining_seconds(job):
+        chars = job.get('text_chars') or job_store.default_book_chars
+        if job['status'] == 'processing':
+            return throughput.estimate_seconds(job.get('remaining_chars', chars), backend, TTS_VOICE, overhead=False)
+        return throughput.estimate_seconds(chars, backend, TTS_VOICE)
+    
+    eta = remaining_seconds(job_info)
+    if job_info['status'] == 'queued' and job_info.get('queue_position'):
+        backlog = sum(remaining_seconds(job) for job in job_store.list_jobs('processing'))
+        for job in job_store.dispatch_order(job_executor.size_rate()):
+            if job['job_id'] == job_info['job_id']:
+                break
+            backlog += remaining_seconds({**job, 'status': 'queued'})
+        eta += backlog / max(job_store.worker_slots(), 1)
+    return eta
+
+def describe_eta(seconds: float) -> str:
+    minutes = round(seconds / 60)
+    return f'about {minutes} minutes' if minutes > 1 else 'about a minute'
+
+@app.route('/api/jobs/<job_id>')
+def poll_job(job_id):
+    """
+    Job state, long-polled with ?since=<version>
+
+    Without since this answers at once. With it, the request is held until
+    the job's version moves past since (or the job finishes), for at most
+    ?timeout= seconds; an unchanged version in the answer means nothing
+    happened and the client should simply ask again.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        timeout = min(request.args.get('timeout', JOB_LONG_POLL_MAX_TIMEOUT, type=float), JOB_LONG_POLL_MAX_TIMEOUT)
+        
+        if since is None:
+            job_info = job_store.get_job(job_id)
+            if job_info is None:
+                job_info = indexed_job_state(job_id)
+        else:
+            job_info = wait_for_job(job_id, since, max(timeout, 0))
+        
+        if job_info is None:
+            return jsonify({'job_id': job_id, 'status': 'not_found', 'message': 'Job not found or expired'}), 404
+        return jsonify(job_state(job_info))
+        
+    except Exception as e:
+        logger.error(f"Job poll failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running conversion (a running one stops within a few seconds)"""
+    try:
+        job_info = job_store.get_job(job_id)
+        if job_info is None:
+            return jsonify({'job_id': job_id, 'status': 'not_found', 'message': 'Job not found or expired'}), 404
+        if job_info['status'] in TERMINAL_STATUSES:
+            return jsonify({**job_info, 'error': f"Job is already {job_info['status']}"}), 409
+        
+        job_info = request_cancellation(job_id, 'Cancelled by user')
+        return jsonify(job_state(job_info)), 202
+        
+    except Exception as e:
+        logger.error(f"Job cancel failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-sent events stream of a job's state
+
+    Every change is sent as a JSON message whose event id is the job's
+    version; the stream ends after the terminal update. Reconnects resume
+    from Last-Event-ID (or ?since=), and a reconnect to a job that has
+    already finished gets 204, which tells EventSource to stop.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since is not None else -1
+    except ValueError:
+        return jsonify({'error': 'Invalid event id'}), 400
+    
+    job_info = job_store.get_job(job_id) or indexed_job_state(job_id)
+    if job_info is None:
+        return jsonify({'job_id': job_id, 'status': 'not_found', 'message': 'Job not found or expired'}), 404
+    if job_info['status'] in TERMINAL_STATUSES and job_info['version'] <= since:
+        return '', 204
+    
+    def stream():
+        version = since
+        deadline = time.monotonic() + JOB_EVENTS_STREAM_SECONDS
+        yield "retry: 1000\n\n"
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            job_info = wait_for_job(job_id, version, min(JOB_EVENTS_KEEPALIVE, remaining))
+            if job_info is None:
+                return
+            changed = job_info['version'] > version
+            if changed:
+                version = job_info['version']
+                yield f"id: {version}\ndata: {json.dumps(job_state(job_info))}\n\n"
+            if job_info['status'] in TERMINAL_STATUSES:
+                return
+            if not changed:
+                yield ": keepalive\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/processing-status')
 def get_processing_status():
     """Get status of all currently processing jobs"""
     try:
-        active_jobs = []
-        completed_count = 0
-        
-        for job_id, job_info in processing_jobs.items():
-            if job_info['status'] == 'processing':
-                active_jobs.append(job_info)
-            elif job_info['status'] == 'completed':
-                completed_count += 1
+        active_jobs = job_store.list_jobs('processing')
+        queued_jobs = job_store.list_jobs('queued')
+        for job_info in queued_jobs:
+            job_info['queue_position'] = job_executor.queue_position(job_info['job_id'])
+        job_counts = job_store.count_jobs()
         
         return jsonify({
             'active_jobs': active_jobs,
-            'total_active': len(active_jobs),
-            'total_completed': completed_count,
-            'processed_epubs': len(processed_epubs),
+            'queued_jobs': queued_jobs,
+            'total_active': job_counts.get('processing', 0),
+            'total_queued': job_counts.get('queued', 0),
+            'total_completed': job_counts.get('completed', 0),
+            'total_failed': job_counts.get('failed', 0),
+            'total_cancelled': job_counts.get('cancelled', 0),
+            'processed_epubs': get_processed_count(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -221,74 +492,237 @@ def stream_audio(user_id, job_id, chapter_file):
             return jsonify({'error': 'R2 not configured'}), 500
         
         r2_key = f"{user_id}/{job_id}/{chapter_file}"
-        
-        # Get file metadata first
-        try:
-            head_response = r2.head_object(Bucket=bucket_name, Key=r2_key)
-            file_size = head_response['ContentLength']
-        except Exception as e:
+        next_key = next_chapter_key(r2_key)
+        
+        # Offload the bytes to R2 entirely: redirect to a short-lived signed URL
+        if AUDIO_DELIVERY_MODE in ('redirect', 'presigned'):
+            url, seconds_left = presigned_get_url(r2, bucket_name, r2_key)
+            response = redirect(url, 302)
+            response.headers['Cache-Control'] = f'private, max-age={max(0, seconds_left - 60)}'
+            response.headers['Access-Control-Allow-Origin'] = '*'
+            return response
+        
+        # Size and validators come from the shared HEAD cache
+        meta = head_object_cached(r2, bucket_name, r2_key)
+        if not meta:
             logger.error(f"File not found in R2: {r2_key}")
             return jsonify({'error': 'File not found'}), 404
+        file_size = meta['size']
+        
+        headers = {
+            'Content-Type': 'audio/mpeg',
+            'Accept-Ranges': 'bytes',
+            'ETag': meta['etag'],
+            'Last-Modified': http_date(meta['last_modified']),
+            'Cache-Control': audio_cache_control(r2_key),
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Range, If-None-Match, If-Modified-Since, If-Range',
+            'Access-Control-Expose-Headers': 'Content-Range, Content-Length, ETag, Last-Modified'
+        }
         
-        # Handle range requests for better streaming
-        range_header = request.headers.get('Range')
-        if range_header:
-            # Parse range header: bytes=start-end
-            range_match = re.match(r'bytes=(\d+)-(\d*)', range_header)
-            if range_match:
-                start = int(range_match.group(1))
-                end = int(range_match.group(2)) if range_match.group(2) else file_size - 1
-                
-                # Ensure end doesn't exceed file size
-                end = min(end, file_size - 1)
-                
-                try:
-                    # Get partial content from R2
-                    range_str = f"bytes={start}-{end}"
-                    response = r2.get_object(Bucket=bucket_name, Key=r2_key, Range=range_str)
-                    audio_data = response['Body'].read()
-                    
-                    from flask import Response
-                    return Response(
-                        audio_data,
-                        206,  # Partial Content
-                        headers={
-                            'Content-Type': 'audio/mpeg',
-                            'Accept-Ranges': 'bytes',
-                            'Content-Range': f'bytes {start}-{end}/{file_size}',
-                            'Content-Length': str(len(audio_data)),
-                            'Cache-Control': 'public, max-age=3600',
-                            'Access-Control-Allow-Origin': '*',
-                            'Access-Control-Allow-Headers': 'Range'
-                        }
-                    )
-                except Exception as range_error:
-                    logger.warning(f"Range request failed, falling back to full file: {range_error}")
-                    # Fall through to full file download
+        # Revalidation: no R2 call and no body
+        if is_not_modified(meta):
+            return Response(status=304, headers=headers)
+        
+        # HEAD is answered from the cached metadata alone; opening an R2 body (or a cached
+        # file) that is never read would hold its connection until garbage collection.
+        # Range only applies to GET, so HEAD always describes the whole file.
+        if request.method == 'HEAD':
+            return Response(status=200, headers={
+                **headers,
+                'Content-Disposition': f'inline; filename="{chapter_file}"',
+                'Content-Length': str(file_size)
+            })
+        
+        # Serve repeat plays and seeks from the local disk cache
+        if audio_cache:
+            cached_path = audio_cache.get(r2_key)
+            if cached_path:
+                if next_key:
+                    audio_cache.warm(r2, bucket_name, next_key)
+                return send_cached_audio(cached_path, chapter_file, meta, headers)
+        
+        # Cache miss: fill this chapter (and the next one) in the background
+        if audio_cache:
+            audio_cache.warm(r2, bucket_name, *[key for key in (r2_key, next_key) if key])
+        
+        # Byte ranges (If-Range may veto a stale range); never degrade to the full file
+        try:
+            ranges = requested_ranges(file_size, meta)
+        except RangeNotSatisfiable:
+            return range_not_satisfiable(file_size, headers)
+        
+        if ranges:
+            def read_r2_range(start, end):
+                response = r2.get_object(Bucket=bucket_name, Key=r2_key, Range=f'bytes={start}-{end}')
+                return stream_r2_body(response['Body'])
+            
+            # Only the first part is fetched before the headers go out; an InvalidRange here
+            # means the object shrank since its HEAD was cached
+            start, end = ranges[0]
+            try:
+                first_part = r2.get_object(Bucket=bucket_name, Key=r2_key, Range=f'bytes={start}-{end}')
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'InvalidRange':
+                    raise
+                invalidate_head_cache(r2_key)
+                return range_not_satisfiable(file_size, headers)
+            
+            if len(ranges) == 1:
+                return Response(
+                    stream_r2_body(first_part['Body']),
+                    206,  # Partial Content
+                    headers={
+                        **headers,
+                        'Content-Range': content_range(start, end, file_size),
+                        'Content-Length': str(end - start + 1)
+                    },
+                    direct_passthrough=True
+                )
+            
+            # The remaining parts are read after the headers are sent, when a failed fetch can
+            # only cut the body short: check them against the size R2 reported for the first
+            actual_size = int(first_part['ContentRange'].rsplit('/', 1)[1])
+            if actual_size != file_size:
+                invalidate_head_cache(r2_key)
+                file_size = actual_size
+                if any(part_end >= file_size for _, part_end in ranges):
+                    first_part['Body'].close()
+                    return range_not_satisfiable(file_size, headers)
+            
+            unread = [first_part['Body']]
+            
+            def read_part(start, end):
+                if unread:
+                    return stream_r2_body(unread.pop())
+                return read_r2_range(start, end)
+            
+            return multipart_range_response(ranges, file_size, headers, read_part)
         
         # Get full file from R2
         response = r2.get_object(Bucket=bucket_name, Key=r2_key)
-        audio_data = response['Body'].read()
         
-        # Return audio file with proper headers
-        from flask import Response
+        # Stream it through in fixed-size chunks instead of buffering the chapter
         return Response(
-            audio_data,
-            mimetype='audio/mpeg',
+            stream_r2_body(response['Body']),
             headers={
+                **headers,
                 'Content-Disposition': f'inline; filename="{chapter_file}"',
-                'Accept-Ranges': 'bytes',
-                'Content-Length': str(len(audio_data)),
-                'Cache-Control': 'public, max-age=3600',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Headers': 'Range'
-            }
+                'Content-Length': str(response['ContentLength'])
+            },
+            direct_passthrough=True
         )
         
     except Exception as e:
         logger.error(f"Stream audio error: {e}")
         return jsonify({'error': str(e)}), 404
 
+def audio_cache_control(r2_key: str) -> str:
+    """Chapter files never change once written, so clients may cache them for good"""
+    if re.search(r'/chapter_\d+\.mp3$', r2_key):
+        return f'public, max-age={AUDIO_IMMUTABLE_MAX_AGE}, immutable'
+    return 'public, max-age=3600'
+
+def is_not_modified(meta: dict) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the object's validators"""
+    if request.if_none_match:
+        etag, _ = unquote_etag(meta['etag'])
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return meta['last_modified'].replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def range_still_valid(meta: dict) -> bool:
+    """If-Range: only honour the Range header if the client's copy is current"""
+    if_range = request.if_range
+    if if_range.etag:
+        etag, weak = unquote_etag(meta['etag'])
+        return not weak and if_range.etag == etag
+    if if_range.date:
+        return meta['last_modified'].replace(microsecond=0) == if_range.date
+    return True
+
+def requested_ranges(file_size: int, meta: dict):
+    """Byte ranges to serve for this request, or None for the full file"""
+    range_header = request.headers.get('Range')
+    if not range_header or not range_still_valid(meta):
+        return None
+    return parse_range_header(range_header, file_size)
+
+def range_not_satisfiable(file_size: int, headers: dict):
+    return Response(
+        status=416,
+        headers={**headers, 'Content-Range': unsatisfiable_content_range(file_size), 'Content-Length': '0'}
+    )
+
+def multipart_range_response(ranges: list, file_size: int, headers: dict, read_range):
+    """206 multipart/byteranges response; read_range(start, end) yields one part's bytes"""
+    multipart = MultipartByteranges(ranges, file_size, headers['Content-Type'])
+    return Response(
+        multipart.body(read_range),
+        206,
+        headers={
+            **headers,
+            'Content-Type': multipart.content_type,
+            'Content-Length': str(multipart.content_length)
+        },
+        direct_passthrough=True
+    )
+
+def stream_r2_body(body):
+    """
+    Yield an R2 object body in fixed-size chunks
+
+    The next chunk is read from R2 only after the previous one has been written
+    to the client, so a connection never buffers more than STREAM_CHUNK_SIZE
+    bytes no matter how large the chapter is. The R2 connection is released
+    when the response finishes or the client disconnects.
+    """
+    try:
+        for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+            yield chunk
+    finally:
+        body.close()
+
+def send_cached_audio(path: str, chapter_file: str, meta: dict, headers: dict):
+    """Serve a cached chapter (or the requested byte ranges of it) from local disk"""
+    file_size = os.path.getsize(path)
+    try:
+        ranges = requested_ranges(file_size, meta)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(file_size, headers)
+    
+    if ranges and len(ranges) > 1:
+        audio_cache.record_served(sum(end - start + 1 for start, end in ranges))
+        return multipart_range_response(
+            ranges, file_size, headers,
+            lambda start, end: read_file_range(path, start, end)
+        )
+    
+    headers = dict(headers)
+    if ranges:
+        start, end = ranges[0]
+        status = 206
+        headers['Content-Range'] = content_range(start, end, file_size)
+    else:
+        start, end = 0, file_size - 1
+        status = 200
+        headers['Content-Disposition'] = f'inline; filename="{chapter_file}"'
+    
+    length = end - start + 1
+    headers['Content-Length'] = str(length)
+    
+    audio_file = open(path, 'rb')
+    audio_file.seek(start)
+    audio_cache.record_served(length)
+    
+    return Response(
+        file_body(request.environ, audio_file, length),
+        status,
+        headers=headers,
+        direct_passthrough=True
+    )
+
 @app.route('/api/process-all-epubs', methods=['POST'])
 def process_all_epubs():
     """Manually trigger processing of all EPUBs in bucket"""
@@ -297,26 +731,37 @@ def process_all_epubs():
         if not r2 or not bucket_name:
             return jsonify({'error': 'R2 not configured'}), 500
         
-        # Find all EPUB files
-        response = r2.list_objects_v2(Bucket=bucket_name, Prefix="")
-        epub_files = []
-        
-        for obj in response.get('Contents', []):
-            key = obj['Key']
-            if '/epubs/' in key and key.endswith('.epub'):
-                epub_files.append(key)
-        
-        # Process each EPUB
-        for epub_key in epub_files:
-            if epub_key not in processed_epubs:
-                logger.info(f"🔄 Manually processing EPUB: {epub_key}")
-                process_epub_from_r2(epub_key)
-                processed_epubs.add(epub_key)
+        # Find all EPUB files (every page of every user's epubs/ folder)
+        epub_objects = list(EpubScanner(r2, bucket_name).iter_epubs())
+        epub_files = [obj['Key'] for obj in epub_objects]
+        
+        # Process each EPUB version the ledger has not seen yet
+        ledger = get_epub_ledger()
+        already_processed = 0
+        queued = []
+        deferred = []
+        for obj in epub_objects:
+            epub_key = obj['Key']
+            if ledger.is_processed(epub_key, obj['ETag']):
+                already_processed += 1
+                continue
+            
+            logger.info(f"🔄 Manually processing EPUB: {epub_key}")
+            try:
+                job_id = process_epub_from_r2(epub_key)
+            except QueueFull:
+                deferred.append(epub_key)  # Left unmarked so a later call can queue them
+                continue
+            if job_id:
+                ledger.mark_processed(epub_key, obj['ETag'], job_id)
+                queued.append(job_id)
         
         return jsonify({
             'message': f'Processing {len(epub_files)} EPUB files',
             'epub_files': epub_files,
-            'already_processed': len([f for f in epub_files if f in processed_epubs])
+            'already_processed': already_processed,
+            'queued_jobs': queued,
+            'deferred': deferred
         })
         
     except Exception as e:
@@ -331,195 +776,611 @@ def process_epub():
         user_id = data.get('user_id')
         book_title = data.get('book_title', 'Unknown Book')
         epub_data = data.get('epub_data')  # Base64 encoded
+        priority = data.get('priority', 'interactive')  # 'bulk' for backfills that shouldn't jump the queue
+        if priority not in PRIORITIES:
+            return jsonify({'error': f"priority must be one of {', '.join(PRIORITIES)}"}), 400
+        
+        # Optional webhook: progress milestones and the finished book are POSTed here
+        callback = None
+        if data.get('callback_url'):
+            try:
+                validate_callback_url(data['callback_url'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            callback = {
+                'url': data['callback_url'],
+                'secret': data.get('callback_secret'),
+                'base_url': public_base_url()  # Chapter URLs in the completion payload
+            }
         
         # Create processing job
         job_id = str(uuid.uuid4())
         
-        # Track job status
-        processing_jobs[job_id] = {
-            'job_id': job_id,
-            'user_id': user_id,
-            'book_title': book_title,
-            'status': 'processing',
-            'progress': 0,
-            'started_at': datetime.now().isoformat(),
-            'message': 'Starting EPUB processing...'
-        }
+        # The same book (same voice and pipeline) is never converted twice for a user
+        epub_bytes = base64.b64decode(epub_data)
+        content_key = epub_content_key(epub_bytes)
+        duplicate = find_duplicate_job(user_id, content_key)
+        if duplicate:
+            return duplicate_job_response(duplicate, callback)
         
-        # Start async processing
-        threading.Thread(
-            target=lambda: asyncio.run(process_epub_async(job_id, user_id, book_title, epub_data)),
-            daemon=True
-        ).start()
+        # Hand it to the bounded executor; a full queue is reported, not absorbed
+        try:
+            queue_position = submit_job(
+                job_id, user_id, book_title, payload=epub_bytes, content_key=content_key, callback=callback,
+                priority=priority, text_chars=count_text_chars(epub_bytes)
+            )
+        except DuplicateJob as e:
+            return duplicate_job_response(e.job, callback)  # An identical upload got there first
+        except QueueFull as e:
+            response = jsonify({
+                'status': 'rejected',
+                'error': str(e),
+                'message': 'The conversion queue is full, please try again shortly',
+                'retry_after': e.retry_after
+            })
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
         
+        # A worker may already have finished the job (an unreadable EPUB fails at once), leaving no ETA
+        job_info = job_state(job_store.get_job(job_id))
+        eta = job_info.get('eta_seconds')
         return jsonify({
             'job_id': job_id,
-            'status': 'processing',
-            'message': f'Converting "{book_title}" to audiobook...',
+            'status': 'queued' if queue_position else 'processing',
+            'queue_position': queue_position,
+            'message': (f'Queued "{book_title}" (position {queue_position})' if queue_position
+                        else f'Converting "{book_title}" to audiobook...'),
             'storage': 'cloudflare_r2',
-            'estimated_time': '5-10 minutes',
-            'status_url': f'/api/job-status/{job_id}'
+            'estimated_time': describe_eta(eta) if eta is not None else f"already {job_info['status']}",
+            'eta_seconds': eta,
+            'estimated_completion': job_info.get('estimated_completion'),
+            'status_url': f'/api/job-status/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events',
+            'callback_registered': bool(callback)
         })
         
     except Exception as e:
         logger.error(f"EPUB processing error: {e}")
         return jsonify({'error': str(e)}), 500
 
-async def process_epub_async(job_id: str, user_id: str, book_title: str, epub_data: str):
+def submit_job(job_id: str, user_id: str, book_title: str, epub_key: str = None, payload: bytes = None,
+               content_key: str = None, callback: dict = None, priority: str = 'interactive',
+               text_chars: int = None) -> int:
+    """Queue a conversion of an R2 EPUB or uploaded EPUB bytes; returns its queue position"""
+    index_job(job_id, user_id, 'queued')
+    try:
+        queue_position = job_executor.submit(
+            job_id, user_id, book_title, epub_key=epub_key, payload=payload, content_key=content_key,
+            callback=callback, priority=priority, text_chars=text_chars
+        )
+    except (QueueFull, DuplicateJob):
+        r2, bucket_name = get_r2_client()
+        if r2 and bucket_name:
+            job_index.forget_job(r2, bucket_name, job_id)
+        raise
+    
+    if content_key:
+        index_content(user_id, content_key, job_id)
+        preempt_superseded(job_id, user_id, book_title, content_key)
+    return queue_position
+
+def request_cancellation(job_id: str, reason: str) -> dict:
+    """Cancel a job; a queued one is discarded here, a running one by its worker"""
+    job_info = job_store.cancel_job(job_id, reason)
+    if job_info and job_info['status'] == 'cancelled':
+        discard_cancelled_job(job_id, job_info['user_id'], reason)
+    logger.info(f"🛑 Cancellation of job {job_id} requested: {reason}")
+    return job_info
+
+def preempt_superseded(job_id: str, user_id: str, book_title: str, content_key: str):
+    """Cancel the user's older live jobs for the same title, made obsolete by a different upload of it"""
+    for superseded_id in job_store.find_superseded(user_id, book_title, content_key, job_id):
+        request_cancellation(superseded_id, f'Superseded by job {job_id}')
+
+def discard_cancelled_job(job_id: str, user_id: str, reason: str):
+    """Mark a stopped job cancelled and remove its partial audiobook from R2, the library and the index"""
+    try:
+        job_store.delete_chapters(job_id)
+        r2, bucket_name = get_r2_client()
+        if r2 and bucket_name:
+            library_manifest.remove_audiobook(r2, bucket_name, user_id, job_id)
+            job_index.forget_job(r2, bucket_name, job_id)
+            if storage_ops.prefix_exists(r2, bucket_name, f"{user_id}/{job_id}/"):
+                storage_ops.delete_in_background(f"{user_id}/{job_id}/")
+    except Exception as e:
+        logger.error(f"Failed to clean up cancelled job {job_id}: {e}")
+    
+    job_store.update_job(job_id, status='cancelled', progress=0, message=reason)
+    notify_job(job_id, 'job.cancelled')
+
+def run_job(job: dict):
+    """Convert a job claimed from the queue (runs on an executor worker thread)"""
+    notify_job(job['job_id'], 'job.started')
+    try:
+        convert_job(job)
+    except Exception as e:
+        # The executor marks the job failed once this propagates
+        notify_job(job['job_id'], 'job.failed', status='failed', error=str(e))
+        raise
+
+def convert_job(job: dict):
+    job_id, user_id = job['job_id'], job['user_id']
+    
+    if job['epub_key']:
+        # Scanned EPUBs are downloaded only now, so queued jobs hold no EPUB bytes
+        epub_bytes = download_epub_from_r2(job['epub_key'])
+        if not epub_bytes:
+            raise RuntimeError(f"Could not download {job['epub_key']}")
+        
+        # Only now is the content known: link to the upload (or earlier scan) of the same book
+        content_key = epub_content_key(epub_bytes)
+        duplicate = (find_duplicate_job(user_id, content_key, job_id)
+                     or job_store.claim_content(job_id, user_id, content_key))
+        if duplicate:
+            link_duplicate_job(job_id, user_id, duplicate)
+            return
+        index_content(user_id, content_key, job_id)
+        preempt_superseded(job_id, user_id, job['book_title'], content_key)
+    else:
+        epub_bytes = job['payload']
+    
+    if job_store.cancel_requested(job_id):
+        discard_cancelled_job(job_id, user_id, job_store.get_job(job_id).get('cancel_reason', 'Cancelled'))
+        return
+    
+    asyncio.run(process_epub_async(job_id, user_id, job['book_title'], epub_bytes))
+
+def epub_content_key(epub_bytes: bytes) -> str:
+    """Dedup key of a conversion: the EPUB's bytes plus everything else that shapes the audio"""
+    digest = hashlib.sha256(epub_bytes).hexdigest()
+    signature = f"{digest}\n{tts_service.backend}\n{TTS_VOICE}\n{PIPELINE_VERSION}"
+    return hashlib.sha256(signature.encode('utf-8')).hexdigest()
+
+def find_duplicate_job(user_id: str, content_key: str, job_id: str = None):
+    """
+    The user's queued, running or completed job for this content (this node
+    first, then R2), or None. job_id is the job asking, which never counts as
+    its own duplicate (a requeued or resumed job finds its own records).
+    """
+    job = job_store.find_content(user_id, content_key, exclude_job_id=job_id)
+    if job:
+        return job
+    
+    try:
+        r2, bucket_name = get_r2_client()
+        if r2 and bucket_name:
+            entry = job_index.lookup_content(r2, bucket_name, user_id, content_key)
+            if entry and entry['job_id'] != job_id:
+                return entry
+    except Exception as e:
+        logger.warning(f"Content index lookup failed for user {user_id}: {e}")
+    return None
+
+def duplicate_job_response(job: dict, callback: dict = None):
+    """Point the caller at the existing job instead of converting the book again"""
+    job_id = job['job_id']
+    
+    # The caller's webhook follows the existing job; a finished one is reported right away
+    callback_registered = False
+    if callback:
+        if job['status'] == 'completed':
+            send_job_event(job_id, 'job.completed', callback)
+            callback_registered = True
+        else:
+            callback_registered = job_store.add_callback(job_id, callback)
+            current = job_store.get_job(job_id)
+            if current and current['status'] in TERMINAL_STATUSES:
+                # Finished between the lookup and the subscription; receivers drop repeats by version
+                send_job_event(job_id, f"job.{current['status']}", callback)
+    
+    response = {
+        'job_id': job_id,
+        'status': job['status'],
+        'duplicate': True,
+        'storage': 'cloudflare_r2',
+        'status_url': f'/api/job-status/{job_id}',
+        'callback_registered': callback_registered
+    }
+    if job['status'] == 'completed':
+        response['message'] = 'This book has already been converted'
+        response['download_url'] = f'/api/download/{job_id}'
+    else:
+        response['message'] = 'This book is already being converted, following the existing job'
+    logger.info(f"♻️ Duplicate EPUB for user {job['user_id']}, linked to job {job_id}")
+    return jsonify(response)
+
+def link_duplicate_job(job_id: str, user_id: str, original: dict):
+    """Finish a job whose book another job already converts, without any TTS work"""
+    job_store.update_job(
+        job_id,
+        status='completed',
+        progress=100,
+        message=f'Same book as job {original["job_id"]}, nothing to convert',
+        duplicate_of=original['job_id']
+    )
+    r2, bucket_name = get_r2_client()
+    if r2 and bucket_name:
+        job_index.forget_job(r2, bucket_name, job_id)
+    logger.info(f"♻️ Job {job_id} duplicates job {original['job_id']}, skipped conversion")
+    notify_job(job_id, 'job.completed')
+
+async def process_epub_async(job_id: str, user_id: str, book_title: str, epub_bytes: bytes):
     """Simplified EPUB processing - just convert and store in R2"""
+    audiobook_metadata = None
+    in_flight = set()  # Upload-pool work that must settle before a cancelled job is cleaned up
+    yield_slot = asyncio.Event()  # Set when a bulk job should give way to an interactive one
+    job_watch = asyncio.create_task(watch_job(job_id, asyncio.current_task(), yield_slot))
     try:
         logger.info(f"Starting EPUB processing for job {job_id}")
         
         # Update job status
-        if job_id in processing_jobs:
-            processing_jobs[job_id].update({
-                'status': 'processing',
-                'progress': 5,
-                'message': 'Extracting chapters from EPUB...'
-            })
-        
-        # 1. Extract chapters from EPUB
-        chapters = extract_chapters_from_epub(epub_data)
-        logger.info(f"Extracted {len(chapters)} chapters")
+        job_store.update_job(job_id, progress=5, message='Extracting chapters from EPUB...')
+        index_job(job_id, user_id, 'processing')
         
-        # Update job status
-        if job_id in processing_jobs:
-            processing_jobs[job_id].update({
-                'progress': 10,
-                'message': f'Found {len(chapters)} chapters, starting TTS conversion...',
-                'total_chapters': len(chapters)
-            })
+        # Chapters an earlier attempt of this job already converted are kept, not redone
+        loop = asyncio.get_running_loop()
+        checkpoint = await loop.run_in_executor(upload_executor, load_checkpoint, job_id, user_id)
+        if checkpoint:
+            logger.info(f"♻️ Resuming job {job_id}: {len(checkpoint)} chapters already converted")
+        publish_lock = asyncio.Lock()
         
         audiobook_metadata = {
             'job_id': job_id,
             'user_id': user_id,
             'book_title': book_title,
             'chapters': [],
+            'total_chapters': 0,
+            'text_chars': 0,
             'created_at': datetime.now().isoformat(),
             'status': 'completed'
         }
         
-        # 2. Convert each chapter to MP3 and upload to R2
-        for i, chapter in enumerate(chapters):
-            logger.info(f"Converting chapter {i+1}/{len(chapters)}")
-            
-            # Update progress
-            progress = 10 + (i * 80 // len(chapters))  # 10-90% for TTS processing
-            if job_id in processing_jobs:
-                processing_jobs[job_id].update({
-                    'progress': progress,
-                    'message': f'Converting chapter {i+1}/{len(chapters)} to speech...',
-                    'current_chapter': i + 1
-                })
-            
-            # Create temp file for MP3
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_file:
-                mp3_path = tmp_file.name
+        # 1. Read chapters from the EPUB in spine order, straight into the synthesis queue.
+        # 2. Convert each chapter to MP3 and upload to R2. Several chapters are synthesized
+        # at once (bounded per backend), and uploads overlap synthesis through a bounded
+        # queue so memory stays capped. Chapters are taken in book order.
+        pending = asyncio.Queue()
+        synthesis_chars = 0
+        for chapter_number, chapter in enumerate(extract_chapters_from_epub(epub_bytes), 1):
+            source_hash = chapter_source_hash(chapter['text'])
+            audiobook_metadata['total_chapters'] = chapter_number
+            audiobook_metadata['text_chars'] += len(chapter['text'])
+            done = checkpoint.get(chapter_number)
+            if done and done['source_hash'] == source_hash:
+                audiobook_metadata['chapters'].append(done)
+            else:
+                pending.put_nowait((chapter_number, chapter, source_hash))
+                synthesis_chars += len(chapter['text'])
+        
+        chapter_count = audiobook_metadata['total_chapters']
+        logger.info(f"Extracted {chapter_count} chapters")
+        job_store.update_job(
+            job_id,
+            progress=10,
+            message=f'Found {chapter_count} chapters, starting TTS conversion...',
+            total_chapters=chapter_count,
+            text_chars=audiobook_metadata['text_chars']
+        )
+        
+        concurrency = synthesis_concurrency()
+        logger.info(f"Converting {pending.qsize()} of {chapter_count} chapters, {concurrency} at a time")
+        synthesis_started = time.monotonic()
+        
+        upload_queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_DEPTH)
+        uploaders = [
+            asyncio.create_task(upload_worker(
+                job_id, user_id, upload_queue, audiobook_metadata, publish_lock, in_flight
+            ))
+            for _ in range(UPLOAD_WORKERS)
+        ]
+        synthesizers = [
+            asyncio.create_task(synthesis_worker(pending, upload_queue, chapter_count, yield_slot))
+            for _ in range(min(concurrency, pending.qsize()))
+        ]
+        
+        try:
+            await asyncio.gather(*synthesizers)
             
-            # Convert to speech with automatic language detection
-            success = await tts_service.text_to_speech(
-                chapter['text'], 
-                mp3_path
-            )
+            # Let the uploaders drain the queue, then stop
+            for _ in uploaders:
+                await upload_queue.put(None)
+            await asyncio.gather(*uploaders)
             
-            if success:
-                # Upload to R2
-                r2_key = f"{user_id}/{job_id}/chapter_{i+1}.mp3"
-                r2_url = upload_to_r2(mp3_path, r2_key)
-                
-                if r2_url:
-                    audiobook_metadata['chapters'].append({
-                        'chapter': i + 1,
-                        'title': chapter['title'],
-                        'url': r2_url,
-                        'r2_key': r2_key,
-                        'duration': get_mp3_duration(mp3_path)
-                    })
-                
-                # Cleanup temp file
-                os.unlink(mp3_path)
+        finally:
+            for task in synthesizers + uploaders:
+                task.cancel()
+        
+        if not pending.empty():
+            # Yielded at a chapter boundary; the chapters done so far are checkpointed
+            job_store.requeue_job(job_id, 'Paused for an interactive upload, will resume...')
+            logger.info(f"⏸️ Job {job_id} yielded its slot with {pending.qsize()} chapters left")
+            return
+        
+        # Whole-pipeline rate (all chapters in flight), what ETAs for the next books need
+        throughput.record(tts_service.backend, TTS_VOICE, synthesis_chars, time.monotonic() - synthesis_started)
+        
+        audiobook_metadata = published_metadata(audiobook_metadata, 'completed')
         
         # 3. Save audiobook metadata to R2 as JSON
-        if job_id in processing_jobs:
-            processing_jobs[job_id].update({
-                'progress': 95,
-                'message': 'Saving audiobook metadata...'
-            })
+        job_store.update_job(job_id, progress=95, message='Saving audiobook metadata...')
         
         metadata_key = f"{user_id}/{job_id}/metadata.json"
         save_metadata_to_r2(audiobook_metadata, metadata_key)
+        update_library_manifest(user_id, audiobook_metadata)
+        index_job(job_id, user_id, 'completed')
+        record_first_playable(job_id)
         
         # Mark job as completed
-        if job_id in processing_jobs:
-            processing_jobs[job_id].update({
-                'status': 'completed',
-                'progress': 100,
-                'message': f'Audiobook ready! {len(audiobook_metadata["chapters"])} chapters processed.',
-                'completed_at': datetime.now().isoformat(),
-                'chapters_processed': len(audiobook_metadata['chapters'])
-            })
+        job_store.update_job(
+            job_id,
+            status='completed',
+            progress=100,
+            message=f'Audiobook ready! {len(audiobook_metadata["chapters"])} chapters processed.',
+            metadata_key=metadata_key,
+            chapters_processed=len(audiobook_metadata['chapters'])
+        )
+        notify_job(job_id, 'job.completed')
         
         logger.info(f"Successfully processed EPUB job {job_id} - {len(audiobook_metadata['chapters'])} chapters stored in R2")
         
+    except asyncio.CancelledError:
+        if not job_store.cancel_requested(job_id):
+            raise
+        
+        # Syntheses and uploads are cancelled; uploads already on the pool finish first,
+        # so nothing lands in R2 after the cleanup
+        await asyncio.get_running_loop().run_in_executor(
+            None, wait_futures, list(in_flight), JOB_CANCEL_DRAIN_TIMEOUT
+        )
+        reason = job_store.get_job(job_id).get('cancel_reason', 'Cancelled')
+        discard_cancelled_job(job_id, user_id, reason)
+        converted = len(audiobook_metadata['chapters']) if audiobook_metadata else 0
+        logger.info(f"🛑 Job {job_id} cancelled after {converted} chapters")
+        
     except Exception as e:
         logger.error(f"Async processing failed for job {job_id}: {e}")
+        index_job(job_id, user_id, 'failed')
+        
+        # Chapters already published stay playable, but the book won't get any further
+        if audiobook_metadata and audiobook_metadata['chapters']:
+            failed_metadata = published_metadata(audiobook_metadata, 'failed')
+            save_metadata_to_r2(failed_metadata, f"{user_id}/{job_id}/metadata.json")
+            update_library_manifest(user_id, failed_metadata)
         
         # Mark job as failed
-        if job_id in processing_jobs:
-            processing_jobs[job_id].update({
-                'status': 'failed',
-                'progress': 0,
-                'message': f'Processing failed: {str(e)}',
-                'failed_at': datetime.now().isoformat(),
-                'error': str(e)
-            })
+        job_store.update_job(
+            job_id,
+            status='failed',
+            progress=0,
+            message=f'Processing failed: {str(e)}',
+            error=str(e)
+        )
+        notify_job(job_id, 'job.failed')
+        
+    finally:
+        job_watch.cancel()
+
+async def watch_job(job_id: str, task: asyncio.Task, yield_slot: asyncio.Event):
+    """Cancel the job's pipeline task once the job is asked to stop, and flag when a bulk job should yield"""
+    while True:
+        await asyncio.sleep(JOB_CANCEL_POLL_INTERVAL)
+        if job_store.cancel_requested(job_id):
+            task.cancel()
+            return
+        if not yield_slot.is_set() and job_store.should_yield(job_id):
+            yield_slot.set()
+
+def extract_chapters_from_epub(epub_bytes: bytes):
+    """Chapters ({'title', 'text'}) of an EPUB in reading order, read one spine document at a time"""
+    with EpubReader(epub_bytes) as reader:
+        yield from reader.chapters()
+
+async def synthesis_worker(pending: asyncio.Queue, upload_queue: asyncio.Queue, total_chapters: int,
+                           yield_slot: asyncio.Event):
+    """Synthesize chapters from the pending queue until it is empty (or the job yields its slot)"""
+    while not yield_slot.is_set():
+        try:
+            chapter_number, chapter, source_hash = pending.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        
+        logger.info(f"Converting chapter {chapter_number}/{total_chapters}")
+        audio_data = await tts_service.text_to_speech_bytes(chapter['text'], TTS_VOICE)
+        
+        if audio_data:
+            # Hand off to the uploaders; blocks only if they fall behind
+            await upload_queue.put((chapter_number, chapter['title'], audio_data, source_hash, len(chapter['text'])))
+
+def synthesis_concurrency() -> int:
+    """Chapters synthesized at once for the active backend (TTS_CONCURRENCY_EDGE, TTS_CONCURRENCY_COQUI)"""
+    backend = tts_service.backend
+    default = TTS_CONCURRENCY_DEFAULTS.get(backend, 1)
+    return max(1, int(os.environ.get(f'TTS_CONCURRENCY_{backend.upper()}', default)))
 
-def extract_chapters_from_epub(epub_data: str) -> list:
-    """Extract chapters from base64 EPUB data"""
-    import base64
-    import ebooklib
-    from ebooklib import epub
-    import re
+async def upload_worker(job_id: str, user_id: str, queue: asyncio.Queue, audiobook_metadata: dict,
+                        publish_lock: asyncio.Lock, in_flight: set):
+    """Upload synthesized chapters from the queue until a None sentinel arrives, publishing each one"""
+    loop = asyncio.get_running_loop()
+    chapters_out = audiobook_metadata['chapters']
     
-    # Decode base64 EPUB data
-    epub_bytes = base64.b64decode(epub_data)
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        
+        chapter_number, title, audio_data, source_hash, chars = item
+        r2_key = f"{user_id}/{job_id}/chapter_{chapter_number}.mp3"
+        
+        # Blocking boto3/pydub work runs on the shared upload pool, not the event loop
+        r2_url = await run_tracked(in_flight, upload_audio_to_r2, audio_data, r2_key, source_hash)
+        if r2_url:
+            invalidate_head_cache(r2_key)
+            duration = await loop.run_in_executor(upload_executor, get_mp3_duration, audio_data)
+            entry = {
+                'chapter': chapter_number,
+                'title': title,
+                'url': r2_url,
+                'r2_key': r2_key,
+                'duration': duration,
+                'size': len(audio_data),
+                'source_hash': source_hash,
+                'chars': chars
+            }
+            chapters_out.append(entry)
+            
+            # Serialized so a slower write never replaces newer partial metadata
+            async with publish_lock:
+                partial = published_metadata(audiobook_metadata, 'partial')
+                await run_tracked(in_flight, publish_chapter, job_id, user_id, entry, partial)
+
+def run_tracked(in_flight: set, fn, *args):
+    """Run blocking work that writes to R2 on the upload pool, remembered in in_flight until it is done"""
+    future = upload_executor.submit(fn, *args)
+    in_flight.add(future)
+    future.add_done_callback(in_flight.discard)
+    return asyncio.wrap_future(future)
+
+def published_metadata(audiobook_metadata: dict, status: str) -> dict:
+    """Snapshot of the audiobook so far: ready chapters in order plus their numbers"""
+    chapters = sorted(audiobook_metadata['chapters'], key=lambda c: c['chapter'])
+    return {
+        **audiobook_metadata,
+        'status': status,
+        'chapters': chapters,
+        'ready_chapters': [chapter['chapter'] for chapter in chapters],
+        'updated_at': datetime.now().isoformat()
+    }
+
+def publish_chapter(job_id: str, user_id: str, entry: dict, metadata: dict):
+    """
+    Checkpoint a converted chapter and publish the audiobook so far
+
+    metadata.json and the library entry are rewritten with status 'partial'
+    after every chapter, so players can start on chapter 1 while the rest
+    is converting, and a restarted job can resume from the same record.
+    """
+    try:
+        job_store.record_chapter(job_id, entry)
+        save_metadata_to_r2(metadata, f"{user_id}/{job_id}/metadata.json")
+        update_library_manifest(user_id, metadata)
     
-    # Create temp file
-    with tempfile.NamedTemporaryFile(suffix='.epub', delete=False) as tmp_file:
-        tmp_file.write(epub_bytes)
-        epub_path = tmp_file.name
+        completed, total = len(metadata['chapters']), metadata['total_chapters']
+        job_store.update_job(
+            job_id,
+            progress=10 + completed * 80 // max(total, 1),  # 10-90% for TTS processing
+            message=f'Converted {completed}/{total} chapters to speech...',
+            completed_chapters=completed,
+            total_chapters=total,
+            ready_chapters=metadata['ready_chapters'],
+            remaining_chars=max(metadata['text_chars'] - sum(c.get('chars', 0) for c in metadata['chapters']), 0)
+        )
+        if entry['chapter'] == 1:
+            record_first_playable(job_id)
+            notify_job(job_id, 'job.playable')
+        if completed < total and completed * 4 // total > (completed - 1) * 4 // total:
+            notify_job(job_id, 'job.progress')  # Each quarter of the book
+        
+    except Exception as e:
+        logger.warning(f"Failed to publish chapter {entry['chapter']} of job {job_id}: {e}")
+
+def record_first_playable(job_id: str):
+    """Measure time-to-first-playable: from submission until chapter 1 (or the whole book) is ready"""
+    job_info = job_store.get_job(job_id)
+    if not job_info or job_info.get('first_playable_at'):
+        return
     
+    now = datetime.now()
+    elapsed = (now - datetime.fromisoformat(job_info['queued_at'])).total_seconds()
+    job_store.update_job(job_id, first_playable_at=now.isoformat(), time_to_first_playable=round(elapsed, 1))
+    logger.info(f"▶️ Job {job_id} playable after {elapsed:.1f}s")
+
+def notify_job(job_id: str, event: str, **fields):
+    """POST a job event to the webhooks subscribed to the job"""
     try:
-        book = epub.read_epub(epub_path)
-        chapters = []
-        
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                content = item.get_content().decode('utf-8')
-                # Remove HTML tags
-                text = re.sub(r'<[^>]+>', '', content)
-                text = text.strip()
-                
-                if text and len(text) > 100:
-                    chapters.append({
-                        'title': item.get_name() or f"Chapter {len(chapters) + 1}",
-                        'text': text  # Full text for production audiobooks
-                    })
-        
-        return chapters
+        for callback in job_store.get_callbacks(job_id):
+            send_job_event(job_id, event, callback, **fields)
+    except Exception as e:
+        logger.warning(f"Could not send {event} webhook for job {job_id}: {e}")
+
+def send_job_event(job_id: str, event: str, callback: dict, **fields):
+    """Deliver one job event; job.completed carries the chapter URLs"""
+    job_info = job_store.get_job(job_id) or {'job_id': job_id, 'status': 'completed'}
+    payload = {
+        'job_id': job_id,
+        'status': job_info['status'],
+        'progress': job_info.get('progress'),
+        'message': job_info.get('message'),
+        'book_title': job_info.get('book_title'),
+        'version': job_info.get('version'),  # Deliveries may arrive out of order; keep the highest
+        'completed_chapters': job_info.get('completed_chapters'),
+        'total_chapters': job_info.get('total_chapters'),
+        **fields
+    }
+    if event == 'job.completed':
+        r2, bucket_name = get_r2_client()
+        audiobook_id, metadata = load_audiobook(r2, bucket_name, job_id)
+        if metadata:
+            payload['chapters'] = client_chapters(r2, bucket_name, metadata['chapters'], callback['base_url'])
+            payload['book_title'] = metadata['book_title']
+        payload['download_url'] = f"{callback['base_url']}/api/download/{job_id}"
+    
+    webhook_sender.send(callback['url'], event, payload, secret=callback.get('secret'))
+
+def chapter_source_hash(text: str) -> str:
+    """Hash of everything that determines a chapter's audio: backend, voice and text"""
+    return hashlib.sha256(f"{tts_service.backend}\n{TTS_VOICE}\n{text}".encode('utf-8')).hexdigest()
+
+def load_checkpoint(job_id: str, user_id: str) -> dict:
+    """
+    Chapters converted by earlier attempts of a job, keyed by chapter number
+
+    Merges the job store with the partial metadata.json in R2 and keeps only
+    chapters whose MP3 is still in R2 at the recorded size; the caller
+    compares source hashes against the current chapter text.
+    """
+    chapters = {}
+    try:
+        r2, bucket_name = get_r2_client()
+        if not r2 or not bucket_name:
+            return chapters
+        
+        partial, _ = read_json_object(r2, bucket_name, f"{user_id}/{job_id}/metadata.json")
+        for entry in (partial or {}).get('chapters', []):
+            chapters[entry['chapter']] = entry
+        for entry in job_store.get_chapters(job_id):
+            chapters[entry['chapter']] = entry
+        if not chapters:
+            return chapters
+        
+        # One listing verifies every chapter object instead of a HEAD per chapter
+        sizes = {obj['Key']: obj['Size'] for obj in storage_ops.iter_objects(r2, bucket_name, f"{user_id}/{job_id}/")}
+        return {
+            number: entry for number, entry in chapters.items()
+            if entry.get('source_hash') and sizes.get(entry['r2_key']) == entry.get('size')
+        }
         
-    finally:
-        os.unlink(epub_path)
+    except Exception as e:
+        logger.warning(f"Could not load checkpoint for job {job_id}, converting from scratch: {e}")
+        return {}
 
-def upload_to_r2(file_path: str, r2_key: str) -> str:
-    """Upload file to Cloudflare R2 and return URL"""
+def upload_audio_to_r2(audio_data: bytes, r2_key: str, source_hash: str = None) -> str:
+    """Upload MP3 bytes to Cloudflare R2 from memory and return URL"""
     try:
         r2, bucket_name = get_r2_client()
         if not r2 or not bucket_name:
             logger.warning("R2 not configured, skipping upload")
             return None
         
-        r2.upload_file(file_path, bucket_name, r2_key)
+        r2.upload_fileobj(
+            BytesIO(audio_data),
+            bucket_name,
+            r2_key,
+            ExtraArgs={
+                'ContentType': 'audio/mpeg',
+                'Metadata': {'source-sha256': source_hash} if source_hash else {}
+            },
+            Config=UPLOAD_TRANSFER_CONFIG
+        )
         # Cloudflare R2 public URL format
         url = f"https://pub-{bucket_name}.r2.dev/{r2_key}"
         return url
@@ -547,11 +1408,48 @@ def save_metadata_to_r2(metadata: dict, r2_key: str):
     except Exception as e:
         logger.error(f"Failed to save metadata to R2: {e}")
 
-def get_mp3_duration(file_path: str) -> int:
+def update_library_manifest(user_id: str, metadata: dict):
+    """Add an audiobook to the user's library manifest, or refresh its entry"""
+    try:
+        r2, bucket_name = get_r2_client()
+        if not r2 or not bucket_name:
+            return
+        
+        library_manifest.upsert_audiobook(r2, bucket_name, user_id, metadata)
+        logger.info(f"Updated library manifest for user {user_id}")
+        
+    except Exception as e:
+        logger.error(f"Failed to update library manifest for user {user_id}: {e}")
+
+def index_content(user_id: str, content_key: str, job_id: str):
+    """Record which job converts this content, so other nodes and later uploads find it"""
+    try:
+        r2, bucket_name = get_r2_client()
+        if not r2 or not bucket_name:
+            return
+        
+        job_index.record_content(r2, bucket_name, user_id, content_key, job_id)
+        
+    except Exception as e:
+        logger.error(f"Failed to update content index for job {job_id}: {e}")
+
+def index_job(job_id: str, user_id: str, status: str):
+    """Record where a job's audiobook lives in the job index"""
+    try:
+        r2, bucket_name = get_r2_client()
+        if not r2 or not bucket_name:
+            return
+        
+        job_index.record_job(r2, bucket_name, job_id, user_id, status)
+        
+    except Exception as e:
+        logger.error(f"Failed to update job index for job {job_id}: {e}")
+
+def get_mp3_duration(audio_data: bytes) -> int:
     """Get MP3 duration in seconds"""
     try:
         from pydub import AudioSegment
-        audio = AudioSegment.from_mp3(file_path)
+        audio = AudioSegment.from_file(BytesIO(audio_data), format='mp3')
         return len(audio) // 1000  # Convert to seconds
     except:
         return 0  # Default duration
@@ -564,30 +1462,11 @@ def get_audiobooks(user_id):
         if not r2 or not bucket_name:
             return jsonify({'audiobooks': [], 'total': 0})
         
-        # List user's audiobooks in R2
-        prefix = f"{user_id}/"
-        response = r2.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter='/')
-        
-        audiobooks = []
-        for obj in response.get('CommonPrefixes', []):
-            # Each folder is a job_id (audiobook)
-            job_folder = obj['Prefix']
-            metadata_key = f"{job_folder}metadata.json"
-            
-            try:
-                # Get metadata
-                metadata_obj = r2.get_object(Bucket=bucket_name, Key=metadata_key)
-                metadata = json.loads(metadata_obj['Body'].read())
-                
-                audiobooks.append({
-                    'id': metadata['job_id'],
-                    'title': metadata['book_title'],
-                    'chapters': len(metadata['chapters']),
-                    'created_at': metadata['created_at'],
-                    'download_url': f'/api/download/{metadata["job_id"]}'
-                })
-            except Exception as e:
-                logger.warning(f"Could not load metadata for {metadata_key}: {e}")
+        # One GET for the maintained manifest; rebuild it once from metadata if missing
+        audiobooks = library_manifest.load_library(r2, bucket_name, user_id)
+        if audiobooks is None:
+            logger.info(f"No library manifest for user {user_id}, rebuilding from metadata")
+            audiobooks = library_manifest.rebuild_library(r2, bucket_name, user_id)
         
         return jsonify({'audiobooks': audiobooks, 'total': len(audiobooks)})
         
@@ -597,39 +1476,110 @@ def get_audiobooks(user_id):
 
 @app.route('/api/audiobooks/<user_id>/<audiobook_id>', methods=['DELETE'])
 def delete_audiobook(user_id, audiobook_id):
-    """Delete audiobook from R2 storage"""
+    """Delete audiobook from R2 storage (files are removed in the background)"""
     try:
         r2, bucket_name = get_r2_client()
         if not r2 or not bucket_name:
             return jsonify({'error': 'Storage not available'}), 500
         
-        # List all objects for this audiobook
+        # A book still converting is cancelled first, or its worker would publish chapters,
+        # metadata and the library entry again after the delete
+        job_info = job_store.get_job(audiobook_id)
+        converting = bool(job_info and job_info['user_id'] == user_id and job_info['status'] in ACTIVE_STATUSES)
+        if converting:
+            request_cancellation(audiobook_id, 'Audiobook deleted')
+        
         prefix = f"{user_id}/{audiobook_id}/"
-        response = r2.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+        if not converting and not storage_ops.prefix_exists(r2, bucket_name, prefix):
+            return jsonify({'error': 'Audiobook not found'}), 404
         
-        deleted_files = []
-        for obj in response.get('Contents', []):
-            key = obj['Key']
-            try:
-                r2.delete_object(Bucket=bucket_name, Key=key)
-                deleted_files.append(key)
-                logger.info(f"Deleted file from R2: {key}")
-            except Exception as e:
-                logger.error(f"Failed to delete {key}: {e}")
+        # Hide it from the library and job index right away, and let its EPUB be converted again
+        try:
+            library_manifest.remove_audiobook(r2, bucket_name, user_id, audiobook_id)
+            job_index.forget_job(r2, bucket_name, audiobook_id)
+            content_keys = job_store.release_content(user_id, audiobook_id)
+            job_index.forget_content(r2, bucket_name, user_id, audiobook_id, content_keys)
+        except Exception as e:
+            logger.error(f"Failed to update library manifest for user {user_id}: {e}")
         
-        if deleted_files:
-            return jsonify({
-                'message': f'Deleted audiobook {audiobook_id}',
-                'deleted_files': deleted_files,
-                'total_deleted': len(deleted_files)
-            })
-        else:
-            return jsonify({'error': 'Audiobook not found'}), 404
+        # Batched deletion behind a tombstone, so this request returns immediately
+        storage_ops.delete_in_background(prefix)
+        
+        return jsonify({
+            'message': f'Deleting audiobook {audiobook_id}',
+            'audiobook_id': audiobook_id,
+            'status': 'deleting'
+        }), 202
         
     except Exception as e:
         logger.error(f"Delete audiobook error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/audiobooks/<user_id>', methods=['DELETE'])
+def purge_user(user_id):
+    """Delete a user's whole library, EPUBs included (in the background)"""
+    try:
+        r2, bucket_name = get_r2_client()
+        if not r2 or not bucket_name:
+            return jsonify({'error': 'Storage not available'}), 500
+        
+        prefix = f"{user_id}/"
+        if not storage_ops.prefix_exists(r2, bucket_name, prefix):
+            return jsonify({'error': 'User not found'}), 404
+        
+        for status in ACTIVE_STATUSES:
+            for job_info in job_store.list_jobs(status, limit=-1):
+                if job_info['user_id'] == user_id:
+                    request_cancellation(job_info['job_id'], 'Library deleted')
+        
+        job_ids = storage_ops.list_job_ids(r2, bucket_name, user_id)
+        job_index.forget_jobs(r2, bucket_name, job_ids)
+        job_store.release_content(user_id)
+        job_index.forget_user_content(r2, bucket_name, user_id)
+        get_epub_ledger().forget_prefix(prefix)
+        storage_ops.delete_in_background(prefix)
+        
+        return jsonify({
+            'message': f'Deleting all data for user {user_id}',
+            'user_id': user_id,
+            'audiobooks': len(job_ids),
+            'status': 'deleting'
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Purge user error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def load_audiobook(r2, bucket_name: str, audiobook_id: str):
+    """(audiobook_id, metadata) of an audiobook, following jobs that duplicate another; metadata is None if not found"""
+    # A job that turned out to duplicate another one serves that job's audiobook
+    job_info = job_store.get_job(audiobook_id)
+    if job_info and job_info.get('duplicate_of'):
+        audiobook_id = job_info['duplicate_of']
+    
+    # Resolve the audiobook's location through the job index
+    entry = job_index.lookup_job(r2, bucket_name, audiobook_id)
+    if not entry:
+        return audiobook_id, None
+    metadata, _ = read_json_object(r2, bucket_name, entry['metadata_key'])
+    if metadata is None:
+        logger.warning(f"Metadata missing for indexed audiobook {audiobook_id}")
+    return audiobook_id, metadata
+
+def client_chapters(r2, bucket_name: str, chapters: list, base_url: str) -> list:
+    """Chapter entries with URLs pointing at the streaming endpoint, or straight at R2"""
+    updated_chapters = []
+    for chapter in chapters:
+        updated_chapter = chapter.copy()
+        r2_key = updated_chapter['r2_key']
+        if AUDIO_DELIVERY_MODE == 'presigned':
+            updated_chapter['url'], updated_chapter['url_expires_in'] = presigned_get_url(r2, bucket_name, r2_key)
+        else:
+            user_id, job_id, filename = r2_key.split('/')
+            updated_chapter['url'] = f"{base_url}/api/stream/{user_id}/{job_id}/{filename}"
+        updated_chapters.append(updated_chapter)
+    return updated_chapters
+
 @app.route('/api/download/<audiobook_id>')
 def download_audiobook(audiobook_id):
     """Get download URLs for all chapters of an audiobook"""
@@ -638,36 +1588,18 @@ def download_audiobook(audiobook_id):
         if not r2 or not bucket_name:
             return jsonify({'error': 'Storage not available'}), 500
         
-        # Find the audiobook metadata
-        # We need to scan user folders since we don't store user_id in the route
-        response = r2.list_objects_v2(Bucket=bucket_name, Prefix="", Delimiter='/')
-        
-        for prefix_obj in response.get('CommonPrefixes', []):
-            user_folder = prefix_obj['Prefix']
-            metadata_key = f"{user_folder}{audiobook_id}/metadata.json"
-            
-            try:
-                metadata_obj = r2.get_object(Bucket=bucket_name, Key=metadata_key)
-                metadata = json.loads(metadata_obj['Body'].read())
-                
-                # Update chapter URLs to use Flask streaming proxy
-                updated_chapters = []
-                for chapter in metadata['chapters']:
-                    updated_chapter = chapter.copy()
-                    # Replace R2 URL with Flask streaming URL
-                    r2_key = updated_chapter['r2_key']
-                    user_id, job_id, filename = r2_key.split('/')
-                    updated_chapter['url'] = f"https://epub-audiobook-service-ab00bb696e09.herokuapp.com/api/stream/{user_id}/{job_id}/{filename}"
-                    updated_chapters.append(updated_chapter)
-                
-                return jsonify({
-                    'audiobook_id': audiobook_id,
-                    'title': metadata['book_title'],
-                    'chapters': updated_chapters,
-                    'total_chapters': len(updated_chapters)
-                })
-            except:
-                continue
+        audiobook_id, metadata = load_audiobook(r2, bucket_name, audiobook_id)
+        if metadata:
+            chapters = client_chapters(r2, bucket_name, metadata['chapters'], public_base_url())
+            return jsonify({
+                'audiobook_id': audiobook_id,
+                'title': metadata['book_title'],
+                'chapters': chapters,
+                'total_chapters': metadata.get('total_chapters', len(chapters)),
+                'completed_chapters': len(chapters),
+                'status': metadata.get('status', 'completed'),
+                'ready_chapters': [chapter['chapter'] for chapter in chapters]
+            })
         
         return jsonify({'error': 'Audiobook not found'}), 404
         
@@ -676,25 +1608,94 @@ def download_audiobook(audiobook_id):
         return jsonify({'error': str(e)}), 500
 
 # QR Code Authentication System
-auth_tokens = {}  # Store temporary auth tokens: {token: {user_id, created_at, expires_at}}
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 300))
+AUTH_TOKEN_MAX = int(os.environ.get('AUTH_TOKEN_MAX', 10000))
+
+class AuthToken:
+    """A pending QR login: the user it signs in and when it stops working"""
+    __slots__ = ('user_id', 'created_at', 'expires_at')
+
+    def __init__(self, user_id: str, created_at: float, expires_at: float):
+        self.user_id = user_id
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    def expired(self, now: float = None) -> bool:
+        return (now or time.time()) > self.expires_at
+
+class AuthTokenRegistry:
+    """
+    Unredeemed QR login tokens, oldest first
+
+    Every token lives for the same TTL, so the oldest entries are the first
+    to expire: they are evicted as new tokens are issued, and beyond
+    max_tokens the oldest go even if still valid. Tokens that are never
+    scanned can't pile up for the life of the process.
+    """
+
+    def __init__(self, ttl: int = AUTH_TOKEN_TTL, max_tokens: int = AUTH_TOKEN_MAX):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self._tokens = OrderedDict()  # token -> AuthToken
+        self._lock = threading.Lock()
+        self.stats = {
+            'issued': 0,
+            'redeemed': 0,
+            'expired': 0,
+            'evicted': 0
+        }
+
+    def issue(self, user_id: str):
+        """A new token for user_id and its record"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            while len(self._tokens) >= self.max_tokens:
+                self._tokens.popitem(last=False)
+                self.stats['evicted'] += 1
+            record = self._tokens[token] = AuthToken(user_id, now, now + self.ttl)
+            self.stats['issued'] += 1
+        return token, record
+
+    def redeem(self, token: str):
+        """Consume a token (valid or not) and return its record, or None if unknown"""
+        with self._lock:
+            record = self._tokens.pop(token, None)
+            if record is not None:
+                self.stats['expired' if record.expired() else 'redeemed'] += 1
+            return record
+
+    def _evict_expired(self, now: float):
+        while self._tokens:
+            token, record = next(iter(self._tokens.items()))
+            if not record.expired(now):
+                break
+            del self._tokens[token]
+            self.stats['expired'] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._evict_expired(time.time())
+            return {
+                **self.stats,
+                'tokens': len(self._tokens),
+                'max_tokens': self.max_tokens,
+                'approx_bytes': sum(
+                    sys.getsizeof(token) + sys.getsizeof(record) + sys.getsizeof(record.user_id)
+                    for token, record in self._tokens.items()
+                )
+            }
+
+auth_tokens = AuthTokenRegistry()
 
 @app.route('/api/generate-auth-qr/<user_id>')
 def generate_auth_qr(user_id):
     """Generate QR code for authentication"""
     try:
-        # Generate secure random token
-        token = secrets.token_urlsafe(32)
-        
-        # Store token with expiration (5 minutes)
-        from datetime import datetime, timedelta
-        created_at = datetime.now()
-        expires_at = created_at + timedelta(minutes=5)
-        
-        auth_tokens[token] = {
-            'user_id': user_id,
-            'created_at': created_at.isoformat(),
-            'expires_at': expires_at.isoformat()
-        }
+        # Generate secure random token that expires after AUTH_TOKEN_TTL
+        token, record = auth_tokens.issue(user_id)
+        expires_at = datetime.fromtimestamp(record.expires_at)
         
         # Create QR code content (URL that app will scan)
         base_url = request.host_url.rstrip('/')
@@ -726,7 +1727,7 @@ def generate_auth_qr(user_id):
             'qr_code_base64': qr_base64,
             'qr_content': qr_content,
             'expires_at': expires_at.isoformat(),
-            'expires_in_minutes': 5
+            'expires_in_minutes': auth_tokens.ttl // 60
         })
         
     except Exception as e:
@@ -737,31 +1738,22 @@ def generate_auth_qr(user_id):
 def verify_auth_token(token):
     """Verify authentication token and return user_id"""
     try:
-        # Check if token exists
-        if token not in auth_tokens:
+        # Tokens are one-time use: redeeming removes it whether or not it is still valid
+        token_data = auth_tokens.redeem(token)
+        if token_data is None:
             return jsonify({
                 'valid': False,
                 'error': 'Invalid token'
             }), 400
         
-        # Check if token is expired
-        token_data = auth_tokens[token]
-        from datetime import datetime
-        expires_at = datetime.fromisoformat(token_data['expires_at'])
-        
-        if datetime.now() > expires_at:
-            # Clean up expired token
-            del auth_tokens[token]
+        if token_data.expired():
             return jsonify({
                 'valid': False,
                 'error': 'Token expired'
             }), 400
         
         # Token is valid
-        user_id = token_data['user_id']
-        
-        # Optionally, clean up used token (one-time use)
-        del auth_tokens[token]
+        user_id = token_data.user_id
         
         logger.info(f"Successfully authenticated user {user_id} with token")
         
@@ -793,32 +1785,44 @@ def auth_redirect():
     else:
         return jsonify({'error': 'Invalid QR code'}), 400
 
-# Cleanup expired tokens periodically
-def cleanup_expired_tokens():
-    """Remove expired authentication tokens"""
-    from datetime import datetime
-    current_time = datetime.now()
-    
-    expired_tokens = []
-    for token, data in auth_tokens.items():
-        expires_at = datetime.fromisoformat(data['expires_at'])
-        if current_time > expires_at:
-            expired_tokens.append(token)
-    
-    for token in expired_tokens:
-        del auth_tokens[token]
-        
-    if expired_tokens:
-        logger.info(f"Cleaned up {len(expired_tokens)} expired auth tokens")
+def backfill_job_index(r2, bucket_name: str):
+    try:
+        job_index.backfill_once(r2, bucket_name)
+    except Exception as e:
+        logger.error(f"Job index backfill failed: {e}")
 
 # R2 EPUB Scanner - Background Process
-processed_epubs = set()  # Track processed files
-processing_jobs = {}  # Track active processing jobs
+_epub_ledger = None  # Durable (r2_key, ETag) ledger of processed EPUBs, shared via R2
+_epub_ledger_lock = threading.Lock()
+
+def get_epub_ledger():
+    """Return the shared processed-EPUB ledger, or None if R2 is not configured"""
+    global _epub_ledger
+    r2, bucket_name = get_r2_client()
+    if not r2 or not bucket_name:
+        return None
+    
+    with _epub_ledger_lock:
+        if _epub_ledger is None:
+            _epub_ledger = ProcessedLedger(r2, bucket_name)
+        return _epub_ledger
+
+def get_processed_count() -> int:
+    """Size of the processed-EPUB ledger (0 if unavailable)"""
+    try:
+        ledger = get_epub_ledger()
+        return ledger.size() if ledger else 0
+    except Exception as e:
+        logger.warning(f"Could not read processed-EPUB ledger: {e}")
+        return 0
 
 def scan_r2_for_epubs():
     """Background thread to scan R2 for new EPUB files and process them"""
     logger.info("🔍 Starting R2 EPUB scanner...")
     
+    scanner = None
+    lease = None
+    
     while True:
         try:
             r2, bucket_name = get_r2_client()
@@ -827,32 +1831,52 @@ def scan_r2_for_epubs():
                 time.sleep(60)
                 continue
             
-            # Scan for EPUB files in user folders
-            response = r2.list_objects_v2(Bucket=bucket_name, Prefix="")
+            # Only the lease holder scans; everyone else stands by to take over
+            if lease is None:
+                lease = LeaderLease(r2, bucket_name)
+            if not lease.acquire():
+                scanner = None  # Reload the persisted cursor if leadership comes back
+                time.sleep(lease.ttl / 3)
+                continue
+            
+            if scanner is None:
+                scanner = EpubScanner(r2, bucket_name)
+                # New leader: finish deletions an earlier process left behind, and index
+                # audiobooks from before the job index (once per bucket)
+                threading.Thread(target=storage_ops.resume_pending_deletes, daemon=True).start()
+                threading.Thread(target=backfill_job_index, args=(r2, bucket_name), daemon=True).start()
+            ledger = get_epub_ledger()
             
-            for obj in response.get('Contents', []):
+            # Bounded, resumable walk of the epubs/ folders; only new or changed files come back
+            for obj in scanner.tick():
                 key = obj['Key']
+                if ledger.is_processed(key, obj['ETag']):
+                    continue
                 
-                # Look for EPUB files in epubs/ folders
-                if '/epubs/' in key and key.endswith('.epub'):
-                    if key not in processed_epubs:
-                        logger.info(f"📚 Found new EPUB: {key}")
-                        process_epub_from_r2(key)
-                        processed_epubs.add(key)
+                logger.info(f"📚 Found new EPUB: {key}")
+                try:
+                    job_id = process_epub_from_r2(key)
+                except QueueFull:
+                    scanner.forget(key)  # Picked up again on the next pass
+                    logger.info(f"⏳ Job queue full, deferring {key}")
+                    continue
+                if job_id:
+                    ledger.mark_processed(key, obj['ETag'], job_id)
             
-            # Sleep for 30 seconds before next scan
-            time.sleep(30)
+            # Adaptive interval: short while uploads arrive, longer while idle
+            # (never past the point where the lease would lapse)
+            time.sleep(min(scanner.interval, lease.ttl / 3))
             
         except Exception as e:
             logger.error(f"R2 scanning error: {e}")
             time.sleep(60)
 
-def process_epub_from_r2(r2_key: str):
-    """Process EPUB file from R2 storage"""
+def process_epub_from_r2(r2_key: str) -> str:
+    """Queue conversion of an EPUB in R2 and return the job ID (raises QueueFull if there is no room)"""
     try:
         r2, bucket_name = get_r2_client()
         if not r2 or not bucket_name:
-            return
+            return None
         
         # Extract user_id and filename from key: user_id/epubs/filename.epub
         parts = r2_key.split('/')
@@ -863,24 +1887,21 @@ def process_epub_from_r2(r2_key: str):
             
             logger.info(f"📖 Processing EPUB: {book_title} for user {user_id}")
             
-            # Download EPUB from R2
-            epub_data = download_epub_from_r2(r2_key)
-            if epub_data:
-                # Generate job ID
-                job_id = str(uuid.uuid4())
-                
-                # Start async processing
-                threading.Thread(
-                    target=lambda: asyncio.run(process_epub_async(job_id, user_id, book_title, epub_data)),
-                    daemon=True
-                ).start()
-                logger.info(f"🎧 Started TTS conversion job {job_id}")
-        
+            job_id = str(uuid.uuid4())
+            # Scans and backfills run as bulk work, behind anything a user is waiting for
+            queue_position = submit_job(job_id, user_id, book_title, epub_key=r2_key, priority='bulk')
+            logger.info(f"🎧 Queued TTS conversion job {job_id} (position {queue_position})")
+            return job_id
+        
+    except QueueFull:
+        raise
     except Exception as e:
         logger.error(f"Error processing EPUB from R2 {r2_key}: {e}")
+    
+    return None
 
-def download_epub_from_r2(r2_key: str) -> str:
-    """Download EPUB file from R2 and return as base64"""
+def download_epub_from_r2(r2_key: str) -> bytes:
+    """Download EPUB file from R2 and return its bytes"""
     try:
         r2, bucket_name = get_r2_client()
         if not r2 or not bucket_name:
@@ -889,11 +1910,8 @@ def download_epub_from_r2(r2_key: str) -> str:
         # Download file
         response = r2.get_object(Bucket=bucket_name, Key=r2_key)
         epub_bytes = response['Body'].read()
-        
-        # Convert to base64
-        epub_b64 = base64.b64encode(epub_bytes).decode('utf-8')
         logger.info(f"📥 Downloaded EPUB from R2: {r2_key}")
-        return epub_b64
+        return epub_bytes
         
     except Exception as e:
         logger.error(f"Error downloading EPUB from R2 {r2_key}: {e}")
@@ -906,9 +1924,13 @@ def start_r2_scanner():
     scanner_thread.start()
     logger.info("🚀 R2 EPUB scanner started!")
 
-if __name__ == '__main__':
-    # Start R2 scanner
+# Every worker runs a scanner thread; the R2 lease lets only one of them scan at a time
+if os.environ.get('R2_SCANNER_ENABLED', 'true').lower() == 'true':
     start_r2_scanner()
-    
+
+# Resume jobs that were queued, or orphaned by a stopped worker, before this process started
+job_executor.start()
+
+if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""
+Shared Cloudflare R2 client
+One pooled, thread-safe boto3 client per process instead of a new client per call,
+plus small helpers for JSON documents that several writers update concurrently
+"""
+import os
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_stats = {
+    'clients_created': 0,
+    'client_reuses': 0
+}
+
+def _build_config() -> Config:
+    """Connection pool, keep-alive, retry and timeout policy for R2"""
+    return Config(
+        max_pool_connections=int(os.environ.get('R2_MAX_POOL_CONNECTIONS', 32)),
+        tcp_keepalive=True,
+        connect_timeout=float(os.environ.get('R2_CONNECT_TIMEOUT', 5)),
+        read_timeout=float(os.environ.get('R2_READ_TIMEOUT', 60)),
+        retries={
+            'max_attempts': int(os.environ.get('R2_MAX_ATTEMPTS', 4)),
+            'mode': os.environ.get('R2_RETRY_MODE', 'standard')
+        }
+    )
+
+def get_r2_client():
+    """Return the shared (client, bucket_name) pair, or (None, None) if R2 is not configured"""
+    global _client, _client_pid
+
+    r2_endpoint = os.environ.get('R2_ENDPOINT_URL')
+    r2_access_key = os.environ.get('R2_ACCESS_KEY_ID')
+    r2_secret_key = os.environ.get('R2_SECRET_ACCESS_KEY')
+    r2_bucket = os.environ.get('R2_BUCKET_NAME')
+
+    if not (r2_endpoint and r2_access_key and r2_secret_key):
+        return None, None
+
+    # Sockets must not be shared across a fork (gunicorn workers), so the
+    # client is rebuilt the first time it is used in a new process
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        _stats['client_reuses'] += 1
+        return _client, r2_bucket
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = boto3.session.Session().client(
+                's3',
+                endpoint_url=r2_endpoint,
+                aws_access_key_id=r2_access_key,
+                aws_secret_access_key=r2_secret_key,
+                region_name='auto',  # Cloudflare R2 uses 'auto'
+                config=_build_config()
+            )
+            _client_pid = pid
+            _stats['clients_created'] += 1
+            logger.info(f"Created shared R2 client (pool size {_client.meta.config.max_pool_connections})")
+        else:
+            _stats['client_reuses'] += 1
+        return _client, r2_bucket
+
+def reset_r2_client():
+    """Drop the shared client so the next call builds a fresh one"""
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+
+def get_r2_stats() -> dict:
+    """Client reuse and HTTP connection reuse counters for this process"""
+    stats = dict(_stats)
+    stats.update({
+        'connections_opened': 0,
+        'requests_sent': 0,
+        'connection_reuses': 0
+    })
+
+    client = _client
+    if client is None:
+        return stats
+
+    stats['max_pool_connections'] = client.meta.config.max_pool_connections
+    try:
+        # urllib3 keeps per-pool counters of sockets opened and requests made
+        manager = client._endpoint.http_session._manager
+        for pool_key in list(manager.pools.keys()):
+            pool = manager.pools.get(pool_key)
+            if pool is None:
+                continue
+            stats['connections_opened'] += pool.num_connections
+            stats['requests_sent'] += pool.num_requests
+        stats['connection_reuses'] = max(0, stats['requests_sent'] - stats['connections_opened'])
+    except Exception as e:
+        logger.debug(f"Could not read R2 connection pool stats: {e}")
+
+    return stats
+
+def _is_precondition_failure(error: ClientError) -> bool:
+    """True if a conditional write lost a race with another writer"""
+    code = error.response.get('Error', {}).get('Code')
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in ('PreconditionFailed', 'ConditionalRequestConflict') or status in (409, 412)
+
+def read_json_object(r2, bucket_name: str, key: str):
+    """Return (data, etag) for a JSON object, or (None, None) if it does not exist"""
+    try:
+        response = r2.get_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None, None
+        raise
+    return json.loads(response['Body'].read()), response['ETag']
+
+def update_json_object(r2, bucket_name: str, key: str, mutate, max_attempts: int = 8):
+    """
+    Atomically read-modify-write a JSON object
+
+    mutate(data) receives the current document (None if missing) and returns the
+    new one. Writes are conditional on the ETag that was read (or on the object
+    still not existing), and are retried with jitter when another writer wins.
+    Returning None from mutate leaves the object untouched.
+    """
+    for attempt in range(max_attempts):
+        data, etag = read_json_object(r2, bucket_name, key)
+        new_data = mutate(data)
+        if new_data is None:
+            return data
+
+        conditions = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            r2.put_object(
+                Bucket=bucket_name,
+                Key=key,
+                Body=json.dumps(new_data, indent=2),
+                ContentType='application/json',
+                **conditions
+            )
+            return new_data
+        except ClientError as e:
+            if not _is_precondition_failure(e):
+                raise
+            logger.info(f"Conditional write conflict on {key}, retrying ({attempt + 1}/{max_attempts})")
+            time.sleep(random.uniform(0.05, 0.2) * (attempt + 1))
+
+    raise RuntimeError(f"Could not update {key} after {max_attempts} attempts")
+
+_presigned_cache = OrderedDict()  # r2_key -> (url, expires_at)
+_presigned_lock = threading.Lock()
+PRESIGNED_CACHE_MAX = 10000
+
+def presigned_get_url(r2, bucket_name: str, r2_key: str, expires_in: int = None) -> tuple:
+    """
+    Return (url, seconds_left) for a short-lived presigned GET
+
+    Signatures are cached and reused until they are close to expiry, so hot
+    chapters are not re-signed on every request.
+    """
+    expires_in = expires_in or int(os.environ.get('PRESIGNED_URL_TTL', 900))
+    refresh_margin = max(30, expires_in // 5)
+    now = time.time()
+
+    with _presigned_lock:
+        cached = _presigned_cache.get(r2_key)
+        if cached and cached[1] - now > refresh_margin:
+            _presigned_cache.move_to_end(r2_key)
+            return cached[0], int(cached[1] - now)
+
+    url = r2.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': r2_key},
+        ExpiresIn=expires_in
+    )
+    with _presigned_lock:
+        _presigned_cache[r2_key] = (url, now + expires_in)
+        _presigned_cache.move_to_end(r2_key)
+        while len(_presigned_cache) > PRESIGNED_CACHE_MAX:
+            _presigned_cache.popitem(last=False)
+    return url, expires_in
+
+_head_cache = OrderedDict()  # r2_key -> (info or None, expires_at)
+_head_lock = threading.Lock()
+HEAD_CACHE_MAX = 10000
+
+def head_object_cached(r2, bucket_name: str, r2_key: str):
+    """
+    Return {'size', 'etag', 'last_modified'} for an object, or None if it does not exist
+
+    Results are cached for R2_HEAD_CACHE_TTL seconds (missing objects for
+    R2_HEAD_NEGATIVE_TTL) so revalidations and seeks don't cost a HEAD each.
+    """
+    now = time.time()
+    with _head_lock:
+        cached = _head_cache.get(r2_key)
+        if cached and cached[1] > now:
+            _head_cache.move_to_end(r2_key)
+            return cached[0]
+
+    try:
+        response = r2.head_object(Bucket=bucket_name, Key=r2_key)
+        info = {
+            'size': response['ContentLength'],
+            'etag': response['ETag'],
+            'last_modified': response['LastModified']
+        }
+        ttl = float(os.environ.get('R2_HEAD_CACHE_TTL', 300))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+        info = None
+        ttl = float(os.environ.get('R2_HEAD_NEGATIVE_TTL', 10))
+
+    with _head_lock:
+        _head_cache[r2_key] = (info, now + ttl)
+        _head_cache.move_to_end(r2_key)
+        while len(_head_cache) > HEAD_CACHE_MAX:
+            _head_cache.popitem(last=False)
+    return info
+
+def invalidate_head_cache(r2_key: str):
+    """Forget cached HEAD metadata after this process writes an object"""
+    with _head_lock:
+        _head_cache.pop(r2_key, None)
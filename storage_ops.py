@@ -0,0 +1,130 @@
+"""
+Bulk R2 storage operations
+Paginated listing, 1000-key batched deletes, whole-user purge and background
+deletion behind a tombstone so API callers never wait on R2.
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+
+from r2_client import get_r2_client
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 1000  # S3/R2 limit for DeleteObjects
+TOMBSTONE_PREFIX = "_system/tombstones/"
+
+def iter_objects(r2, bucket_name: str, prefix: str = ""):
+    """Every object under a prefix, across all result pages"""
+    paginator = r2.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj
+
+def prefix_exists(r2, bucket_name: str, prefix: str) -> bool:
+    """True if at least one object lives under the prefix"""
+    response = r2.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=1)
+    return response.get('KeyCount', len(response.get('Contents', []))) > 0
+
+def delete_keys(r2, bucket_name: str, keys) -> dict:
+    """Delete keys with DeleteObjects in batches of 1000"""
+    result = {'deleted': 0, 'errors': []}
+    batch = []
+
+    def flush():
+        response = r2.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        errors = response.get('Errors', [])
+        result['errors'].extend(errors)
+        result['deleted'] += len(batch) - len(errors)
+        batch.clear()
+
+    for key in keys:
+        batch.append(key)
+        if len(batch) == DELETE_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    for error in result['errors']:
+        logger.error(f"Failed to delete {error.get('Key')}: {error.get('Message')}")
+    return result
+
+def delete_prefix(r2, bucket_name: str, prefix: str) -> dict:
+    """Delete every object under a prefix; returns counts and bytes freed"""
+    sizes = {}
+
+    def keys():
+        for obj in iter_objects(r2, bucket_name, prefix):
+            sizes[obj['Key']] = obj['Size']
+            yield obj['Key']
+
+    result = delete_keys(r2, bucket_name, keys())
+    failed = {error.get('Key') for error in result['errors']}
+    result['bytes_freed'] = sum(size for key, size in sizes.items() if key not in failed)
+    logger.info(f"🗑️ Deleted {result['deleted']} objects under {prefix}")
+    return result
+
+def list_job_ids(r2, bucket_name: str, user_id: str) -> list:
+    """Job folders (audiobooks) of a user"""
+    job_ids = []
+    paginator = r2.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=f"{user_id}/", Delimiter='/'):
+        for obj in page.get('CommonPrefixes', []):
+            folder = obj['Prefix'][len(user_id) + 1:].rstrip('/')
+            if folder != 'epubs':
+                job_ids.append(folder)
+    return job_ids
+
+def tombstone_key(prefix: str) -> str:
+    """R2 key of the tombstone guarding a pending prefix deletion"""
+    return f"{TOMBSTONE_PREFIX}{prefix.rstrip('/')}.json"
+
+def delete_in_background(prefix: str, on_complete=None) -> threading.Thread:
+    """
+    Write a tombstone for the prefix, then delete it on a background thread
+
+    The tombstone is removed once everything under the prefix is gone, so an
+    interrupted deletion is picked up again by resume_pending_deletes().
+    """
+    r2, bucket_name = get_r2_client()
+    r2.put_object(
+        Bucket=bucket_name,
+        Key=tombstone_key(prefix),
+        Body=json.dumps({'prefix': prefix, 'requested_at': datetime.now().isoformat()}),
+        ContentType='application/json'
+    )
+
+    thread = threading.Thread(target=_run_delete, args=(prefix, on_complete), daemon=True)
+    thread.start()
+    return thread
+
+def _run_delete(prefix: str, on_complete=None):
+    try:
+        r2, bucket_name = get_r2_client()
+        result = delete_prefix(r2, bucket_name, prefix)
+        if result['errors']:
+            logger.warning(f"Deletion of {prefix} incomplete, tombstone kept for retry")
+            return
+        r2.delete_object(Bucket=bucket_name, Key=tombstone_key(prefix))
+        if on_complete:
+            on_complete(result)
+    except Exception as e:
+        logger.error(f"Background deletion of {prefix} failed: {e}")
+
+def resume_pending_deletes():
+    """Restart deletions whose tombstones are still present"""
+    r2, bucket_name = get_r2_client()
+    if not r2 or not bucket_name:
+        return 0
+
+    resumed = 0
+    for obj in iter_objects(r2, bucket_name, TOMBSTONE_PREFIX):
+        prefix = obj['Key'][len(TOMBSTONE_PREFIX):-len('.json')] + '/'
+        logger.info(f"🔁 Resuming pending deletion of {prefix}")
+        _run_delete(prefix)
+        resumed += 1
+    return resumed
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the lazy EPUB chapter reader
+Builds small EPUBs in memory, so no service or network is needed.
+
+Usage:
+    python test_epub_reader.py    (or: python -m pytest test_epub_reader.py)
+"""
+import io
+import zipfile
+
+from epub_reader import EpubReader, EpubError
+
+CONTAINER = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>"""
+
+PACKAGE = """<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="cover" href="cover.xhtml" media-type="application/xhtml+xml" properties="cover-image"/>
+    <item id="c1" href="Text/second.xhtml" media-type="application/xhtml+xml"/>
+    <item id="c2" href="Text/first.xhtml" media-type="application/xhtml+xml"/>
+    <item id="notes" href="Text/notes.xhtml" media-type="application/xhtml+xml"/>
+    <item id="art" href="Images/art.png" media-type="image/png"/>
+  </manifest>
+  <spine toc="ncx">
+    <itemref idref="nav"/>
+    <itemref idref="cover"/>
+    <itemref idref="c2"/>
+    <itemref idref="c1"/>
+    <itemref idref="notes" linear="no"/>
+  </spine>
+</package>"""
+
+def page(heading: str) -> str:
+    return f"<html><body><h1>{heading}</h1><p>{'Words of the chapter. ' * 10}</p></body></html>"
+
+def make_epub() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip')
+        archive.writestr('META-INF/container.xml', CONTAINER)
+        archive.writestr('OEBPS/content.opf', PACKAGE)
+        archive.writestr('OEBPS/nav.xhtml', page('Contents: Chapter One, Chapter Two'))
+        archive.writestr('OEBPS/toc.ncx', '<ncx/>')
+        archive.writestr('OEBPS/cover.xhtml', page('Cover'))
+        archive.writestr('OEBPS/Text/first.xhtml', page('Chapter One'))
+        archive.writestr('OEBPS/Text/second.xhtml', page('Chapter Two'))
+        archive.writestr('OEBPS/Text/notes.xhtml', page('Notes'))
+        archive.writestr('OEBPS/Images/art.png', b'\x89PNG' + b'\0' * 1000)
+    return buffer.getvalue()
+
+def test_chapters_in_spine_order():
+    with EpubReader(make_epub()) as reader:
+        titles = [chapter['title'] for chapter in reader.chapters()]
+    assert titles == ['Text/first.xhtml', 'Text/second.xhtml']
+
+def test_table_of_contents_is_not_a_chapter():
+    with EpubReader(make_epub()) as reader:
+        chapters = list(reader.chapters())
+    assert all('Contents' not in chapter['text'] for chapter in chapters)
+    assert 'nav.xhtml' not in [href for _, href in reader.spine]
+
+def test_reads_from_memoryview():
+    with EpubReader(memoryview(make_epub())) as reader:
+        assert len(list(reader.chapters())) == 2
+
+def test_rejects_non_epub():
+    try:
+        EpubReader(b'not a zip')
+    except EpubError:
+        return
+    raise AssertionError('EpubError not raised')
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
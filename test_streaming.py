@@ -35,6 +35,44 @@ def test_streaming_url(url):
         print(f"❌ Error testing URL: {e}")
         return False
 
+def test_range_requests(url):
+    """Check that every kind of byte range is served with exactly the bytes requested"""
+    print(f"Testing byte ranges: {url}")
+    
+    size = int(requests.head(url, timeout=10).headers.get('Content-Length', 0))
+    if size < 2048:
+        print("❌ File too small to test ranges")
+        return False
+    
+    cases = [
+        ('bytes=0-1023', 206, 1024),          # Plain range
+        ('bytes=-128', 206, 128),             # Suffix range (ID3v1 tag)
+        (f'bytes={size - 100}-', 206, 100),   # Open-ended range
+        (f'bytes=0-{size * 2}', 206, size),   # End past EOF is clamped
+        (f'bytes={size}-', 416, 0),           # Starts past EOF
+        ('bytes=500-100', 416, 0),            # Malformed
+    ]
+    
+    passed = True
+    for range_header, expected_status, expected_bytes in cases:
+        response = requests.get(url, headers={'Range': range_header}, timeout=30)
+        served = len(response.content)
+        ok = response.status_code == expected_status and served == expected_bytes
+        passed = passed and ok
+        print(f"{'✅' if ok else '❌'} {range_header}: {response.status_code}, {served} bytes served "
+              f"(expected {expected_status}, {expected_bytes} bytes)")
+    
+    # Multi-range: two parts in one multipart/byteranges body, never the whole file
+    response = requests.get(url, headers={'Range': 'bytes=0-99,-100'}, timeout=30)
+    served = len(response.content)
+    content_type = response.headers.get('Content-Type', '')
+    ok = (response.status_code == 206 and content_type.startswith('multipart/byteranges')
+          and served == int(response.headers.get('Content-Length', -1)) and served < size)
+    passed = passed and ok
+    print(f"{'✅' if ok else '❌'} bytes=0-99,-100: {response.status_code}, {served} bytes served ({content_type})")
+    
+    return passed
+
 def test_audiobook_api(user_id="test_user"):
     """Test the audiobook API endpoints"""
     base_url = "https://epub-audiobook-service-ab00bb696e09.herokuapp.com"
@@ -82,6 +120,7 @@ def test_audiobook_api(user_id="test_user"):
                         chapter_url = chapters[0]['url']
                         print(f"Testing first chapter URL...")
                         test_streaming_url(chapter_url)
+                        test_range_requests(chapter_url)
                 else:
                     print(f"❌ Failed to get audiobook details: {details_response.status_code}")
             else:
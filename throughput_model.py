@@ -0,0 +1,70 @@
+"""
+Synthesis throughput model
+Learns how many characters per second each TTS backend and voice converts,
+from completed jobs, as a moving average kept in the job store (so every
+gunicorn worker shares it and it survives restarts). The rate turns a book's
+length into an ETA and lets the scheduler run short books first.
+"""
+import os
+import logging
+
+from epub_reader import EpubReader, EpubError
+
+logger = logging.getLogger(__name__)
+
+# Starting rates (whole job, all chapters in flight) before any job has been measured
+DEFAULT_CHARS_PER_SECOND = {'edge': 800.0, 'coqui': 20.0}
+FALLBACK_CHARS_PER_SECOND = 100.0
+
+# Jobs that synthesized less than this say more about latency than throughput
+MIN_SAMPLE_CHARS = 2000
+
+def count_text_chars(epub_bytes: bytes):
+    """
+    Approximate characters of speech in an EPUB, or None if it can't be read
+
+    Counts the text of the chapters conversion will synthesize, reading only
+    the spine documents, so it is cheap enough to run at submit.
+    """
+    try:
+        with EpubReader(epub_bytes) as reader:
+            return sum(len(chapter['text']) for chapter in reader.chapters())
+    except EpubError as e:
+        logger.warning(f"Could not size EPUB: {e}")
+        return None
+
+class ThroughputModel:
+    """Characters per second per backend and voice, learned from completed jobs"""
+
+    def __init__(self, store, alpha: float = None):
+        self.store = store
+        self.alpha = alpha or float(os.environ.get('THROUGHPUT_ALPHA', 0.3))  # Weight of the newest job
+        self.overhead = float(os.environ.get('JOB_OVERHEAD_SECONDS', 10))  # Extraction, metadata, library
+
+    def chars_per_second(self, backend: str, voice: str) -> float:
+        learned = self.store.get_throughput(backend, voice)
+        if learned:
+            return learned[0]
+        return DEFAULT_CHARS_PER_SECOND.get(backend, FALLBACK_CHARS_PER_SECOND)
+
+    def record(self, backend: str, voice: str, chars: int, seconds: float):
+        """Learn from a job that synthesized chars characters in seconds"""
+        if chars < MIN_SAMPLE_CHARS or seconds <= 0:
+            return
+        rate = chars / seconds
+        self.store.record_throughput(backend, voice, rate, self.alpha)
+        logger.info(f"📈 {backend}/{voice}: {rate:.0f} chars/s this job, now {self.chars_per_second(backend, voice):.0f}")
+
+    def estimate_seconds(self, chars: int, backend: str, voice: str, overhead: bool = True) -> float:
+        """Expected seconds to synthesize chars characters (plus the fixed per-job work)"""
+        seconds = chars / self.chars_per_second(backend, voice)
+        return seconds + self.overhead if overhead else seconds
+
+    def get_stats(self, backend: str, voice: str) -> dict:
+        learned = self.store.get_throughput(backend, voice)
+        return {
+            'backend': backend,
+            'voice': voice,
+            'chars_per_second': round(self.chars_per_second(backend, voice), 1),
+            'samples': learned[1] if learned else 0
+        }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Job webhooks
+Conversions report progress milestones and their outcome by POSTing JSON to
+the callback_url given at submission, so clients don't have to poll. Each
+delivery carries X-Audiobook-Event, X-Audiobook-Delivery and
+X-Audiobook-Timestamp headers; when the job was submitted with a secret it is
+signed with HMAC-SHA256 over "<timestamp>.<body>" in X-Audiobook-Signature.
+Deliveries that fail with a network error, a 5xx, 408 or 429 are retried
+with exponential backoff without holding up the conversion.
+
+Callbacks may only reach public addresses: hosts that resolve to loopback,
+private, link-local or reserved addresses are refused at submission and
+again before every delivery, and redirects are not followed. Set
+WEBHOOK_ALLOWED_HOSTS to restrict callbacks to a list of hosts, or
+WEBHOOK_ALLOW_PRIVATE=true to deliver to a local receiver in development.
+
+Usage:
+    python webhooks.py [--port 8765] [--secret SECRET]   # local receiver that prints deliveries
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+import ipaddress
+import logging
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+logger = logging.getLogger(__name__)
+
+EVENT_HEADER = 'X-Audiobook-Event'
+DELIVERY_HEADER = 'X-Audiobook-Delivery'
+TIMESTAMP_HEADER = 'X-Audiobook-Timestamp'
+SIGNATURE_HEADER = 'X-Audiobook-Signature'
+
+# Receivers should reject signatures older than this, so captured deliveries can't be replayed
+SIGNATURE_TOLERANCE = 300
+
+_RETRY_STATUSES = (408, 429)
+
+class UnresolvableHost(ValueError):
+    """The callback host doesn't resolve (possibly only for now)"""
+
+def _allowed_hosts() -> set:
+    return {host.strip().lower() for host in os.environ.get('WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()}
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if getattr(ip, 'ipv4_mapped', None):
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def validate_callback_url(url: str):
+    """
+    Raise ValueError unless url is an absolute http(s) URL the service may call
+
+    The host must be on WEBHOOK_ALLOWED_HOSTS when that is set, and every
+    address it resolves to must be public (unless WEBHOOK_ALLOW_PRIVATE),
+    so callbacks can't be aimed at the service's own network.
+    """
+    parsed = urlparse(url or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('callback_url must be an absolute http(s) URL')
+
+    host = parsed.hostname.lower()
+    allowed = _allowed_hosts()
+    if allowed and host not in allowed:
+        raise ValueError('callback_url host is not allowed')
+    if os.environ.get('WEBHOOK_ALLOW_PRIVATE', 'false').lower() == 'true':
+        return
+
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise UnresolvableHost('callback_url host does not resolve')
+    if not addresses or not all(_public_address(address) for address in addresses):
+        raise ValueError('callback_url must point at a public address')
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as errors; following them would skip the address check"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Signature header value for a delivery body"""
+    digest = hmac.new(secret.encode('utf-8'), timestamp.encode('ascii') + b'.' + body, hashlib.sha256)
+    return f'sha256={digest.hexdigest()}'
+
+def verify_signature(secret: str, timestamp: str, body: bytes, signature: str,
+                     tolerance: float = SIGNATURE_TOLERANCE) -> bool:
+    """Check a delivery's signature and that it is recent"""
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance:
+            return False
+    except (TypeError, ValueError):
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), signature or '')
+
+class WebhookSender:
+    """Background delivery of webhook POSTs with exponential backoff"""
+
+    def __init__(self, workers: int = None, max_attempts: int = None, backoff: float = None,
+                 max_backoff: float = None, timeout: float = None):
+        self.max_attempts = max_attempts or int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 6))
+        self.backoff = backoff or float(os.environ.get('WEBHOOK_BACKOFF', 2))
+        self.max_backoff = max_backoff or float(os.environ.get('WEBHOOK_MAX_BACKOFF', 300))
+        self.timeout = timeout or float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers or int(os.environ.get('WEBHOOK_WORKERS', 4)),
+            thread_name_prefix='webhook'
+        )
+        self._lock = threading.Lock()
+        self.stats = {
+            'sent': 0,
+            'delivered': 0,
+            'retried': 0,
+            'dropped': 0
+        }
+
+    def send(self, url: str, event: str, payload: dict, secret: str = None) -> str:
+        """Queue a delivery and return its delivery id"""
+        delivery_id = str(uuid.uuid4())
+        body = json.dumps({'event': event, **payload}).encode('utf-8')
+        with self._lock:
+            self.stats['sent'] += 1
+        self._pool.submit(self._deliver, url, event, body, secret, delivery_id, 1)
+        return delivery_id
+
+    def _deliver(self, url: str, event: str, body: bytes, secret: str, delivery_id: str, attempt: int):
+        # Signed per attempt, so a retry made minutes later still passes the receiver's freshness check
+        timestamp = str(int(time.time()))
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'epub-audiobook-service',
+            EVENT_HEADER: event,
+            DELIVERY_HEADER: delivery_id,
+            TIMESTAMP_HEADER: timestamp
+        }
+        if secret:
+            headers[SIGNATURE_HEADER] = sign(secret, timestamp, body)
+
+        try:
+            # Checked again per attempt: the host may resolve somewhere else by now
+            validate_callback_url(url)
+            request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+            with _opener.open(request, timeout=self.timeout) as response:
+                response.read()
+            with self._lock:
+                self.stats['delivered'] += 1
+            return
+        except urllib.error.HTTPError as e:
+            retry = e.code >= 500 or e.code in _RETRY_STATUSES
+            error = f'HTTP {e.code}'
+        except UnresolvableHost as e:
+            retry = True
+            error = str(e)
+        except ValueError as e:
+            retry = False
+            error = f'refused, {e}'
+        except Exception as e:
+            retry = True
+            error = str(e)
+
+        if not retry or attempt >= self.max_attempts:
+            logger.warning(f"Webhook {event} to {url} dropped after {attempt} attempt(s): {error}")
+            with self._lock:
+                self.stats['dropped'] += 1
+            return
+
+        # Full jitter keeps many failed deliveries from retrying in lockstep
+        delay = random.uniform(0, min(self.backoff * 2 ** (attempt - 1), self.max_backoff))
+        logger.info(f"Webhook {event} to {url} failed ({error}), retry {attempt} in {delay:.1f}s")
+        with self._lock:
+            self.stats['retried'] += 1
+        timer = threading.Timer(
+            delay, self._pool.submit, (self._deliver, url, event, body, secret, delivery_id, attempt + 1)
+        )
+        timer.daemon = True
+        timer.start()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+def main():
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print(__doc__)
+        return
+    port = int(args[args.index('--port') + 1]) if '--port' in args else 8765
+    secret = args[args.index('--secret') + 1] if '--secret' in args else None
+
+    class Receiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            signed = 'unsigned'
+            if secret:
+                valid = verify_signature(
+                    secret, self.headers.get(TIMESTAMP_HEADER), body, self.headers.get(SIGNATURE_HEADER)
+                )
+                signed = 'valid signature' if valid else 'INVALID signature'
+            print(f"📨 {self.headers.get(EVENT_HEADER)} ({signed}) {self.headers.get(DELIVERY_HEADER)}")
+            print(json.dumps(json.loads(body or b'{}'), indent=2))
+            self.send_response(200 if signed != 'INVALID signature' else 401)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"🎧 Listening for webhooks on http://127.0.0.1:{port}/")
+    HTTPServer(('127.0.0.1', port), Receiver).serve_forever()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()